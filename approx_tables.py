@@ -0,0 +1,248 @@
+"""
+approx_tables.py
+----------------
+Table précalculée pour l'inversion rapide (approchée) de la volatilité implicite sur de gros volumes.
+
+Fonctionnalités :
+- Coordonnées normalisées : log-moneyness forward u = |ln(F/K)| et prix normalisé q de l'option
+  hors de la monnaie (call si K >= F, put sinon, via la parité call-put), q = prix / (e^{-rT} min(F, K))
+- Table de la volatilité totale s = σ√T sur une grille (√u, w = √(-2 ln q)), construite une seule fois
+  et sauvegardée sur disque (.npz)
+- Recherche bilinéaire vectorisée, suivie d'un pas de Newton exact optionnel (refine)
+- Repli sur le solveur exact (implied_volatility_batch) hors du domaine de la table
+- Bornes d'erreur mesurées à la construction et mode validation face aux fonctions exactes
+
+Usage :
+    python approx_tables.py --build
+    python approx_tables.py --validate
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+from black_scholes import black_scholes_batch, implied_volatility_batch, option_type_mask, IV_STATUS_OK
+
+DEFAULT_TABLE_PATH = os.environ.get('PRICING_APPROX_TABLE', 'approx_tables.npz')
+TABLE_VERSION = 1
+U_MAX = 3.0                 # |ln(F/K)| maximal couvert par la table
+W_MIN, W_MAX = 1e-3, 8.6    # bornes de w = √(-2 ln q), soit q de 1 à ~1e-16
+S_MIN, S_MAX = 1e-3, 50.0   # volatilité totale σ√T
+SQRT_2PI = np.sqrt(2 * np.pi)
+IDENTIFIABLE_TOL = 1e-6     # validation : écart maximal du solveur exact à la vraie vol
+DEFAULT_SIZE = (400, 400)
+
+_table = None
+
+def _log_otm_price(u, s):
+    """
+    ln q(u, s) : log du prix normalisé d'un call de forward 1 et de strike e^u (u >= 0), soit
+    q = N(d1) - e^u N(d2). Calculé via log_ndtr pour rester précis très hors de la monnaie.
+    """
+    from scipy.special import log_ndtr
+    d1 = -u / s + 0.5 * s
+    log_n1 = log_ndtr(d1)
+    return log_n1 + np.log1p(-np.exp(u + log_ndtr(d1 - s) - log_n1))
+
+def _solve_total_vol(u, log_q, iterations=80):
+    """Volatilité totale s telle que ln q(u, s) = log_q, par bissection en log s (construction de la table)."""
+    lo = np.full(np.shape(u), np.log(S_MIN * 1e-3))
+    hi = np.full(np.shape(u), np.log(S_MAX))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        reachable = _log_otm_price(u, np.exp(hi)) >= log_q
+        for _ in range(iterations):
+            mid = 0.5 * (lo + hi)
+            above = _log_otm_price(u, np.exp(mid)) > log_q
+            hi = np.where(above, mid, hi)
+            lo = np.where(above, lo, mid)
+    return np.where(reachable, 0.5 * (lo + hi), np.nan)
+
+def _normalize(S, K, T, r, price, is_call):
+    """Coordonnées normalisées (u, q) d'une cotation, à partir du prix de l'option hors de la monnaie."""
+    discount = np.exp(-r * T)
+    forward = S / discount
+    x = np.log(forward / K)
+    # Parité call-put : prix de l'option hors de la monnaie (call si K >= F, put sinon)
+    otm = price - np.where(is_call == (x > 0), discount * np.abs(forward - K), 0.0)
+    return np.abs(x), otm / (discount * np.minimum(forward, K))
+
+class ImpliedVolTable:
+    """
+    Table ln s(√u, √(-2 ln q)) et métadonnées (bornes d'erreur mesurées à la construction).
+    refine=0 : recherche seule ; refine=1 (défaut) : un pas de Newton exact, erreur de l'ordre de l'erreur
+    de la table au carré.
+    """
+
+    def __init__(self, log_s, errors=None):
+        self.log_s = log_s
+        self.errors = errors or {}
+
+    @classmethod
+    def build(cls, size=DEFAULT_SIZE, validate_points=200_000):
+        n_u, n_w = size
+        u = U_MAX * np.linspace(0.0, 1.0, n_u)**2     # grille resserrée près de la monnaie
+        w = np.linspace(W_MIN, W_MAX, n_w)
+        U, W = np.meshgrid(u, w, indexing='ij')
+        table = cls(_solve_total_vol(U, -0.5 * W**2))
+        if validate_points:
+            table.errors = {f'refine_{k}': _summary(validate(table, validate_points, refine=k, verbose=False))
+                            for k in (0, 1)}
+        return table
+
+    def save(self, path=DEFAULT_TABLE_PATH):
+        import json
+        np.savez(path, log_s=self.log_s, version=TABLE_VERSION, bounds=[U_MAX, W_MIN, W_MAX, S_MIN, S_MAX],
+                 errors=json.dumps(self.errors))
+        return path
+
+    @classmethod
+    def load(cls, path=DEFAULT_TABLE_PATH):
+        import json
+        with np.load(path) as data:
+            if int(data['version']) != TABLE_VERSION or list(data['bounds']) != [U_MAX, W_MIN, W_MAX, S_MIN, S_MAX]:
+                raise ValueError(f"Table {path} incompatible avec cette version, la reconstruire (--build).")
+            return cls(data['log_s'], json.loads(str(data['errors'])))
+
+    def lookup(self, u, q):
+        """Volatilité totale s par interpolation bilinéaire (NaN hors du domaine de la table)."""
+        n_u, n_w = self.log_s.shape
+        with np.errstate(invalid='ignore', divide='ignore'):
+            a = np.sqrt(u * (1 / U_MAX)) * (n_u - 1)
+            b = (np.sqrt(-2 * np.log(q)) - W_MIN) * ((n_w - 1) / (W_MAX - W_MIN))
+            inside = (a >= 0) & (a < n_u - 1) & (b >= 0) & (b < n_w - 1)
+            a[~inside] = 0.0
+            b[~inside] = 0.0
+        i, j = a.astype(np.intp), b.astype(np.intp)
+        fa, fb = a - i, b - j
+
+        flat = self.log_s.ravel()
+        base = i * n_w + j
+        v00, v01, v10, v11 = flat[base], flat[base + 1], flat[base + n_w], flat[base + n_w + 1]
+        s = np.exp(v00 + (v10 - v00) * fa + (v01 - v00 + (v11 - v10 - v01 + v00) * fa) * fb)
+        s[~inside | (s < S_MIN) | (s > S_MAX)] = np.nan
+        return s
+
+    def implied_volatility(self, S, K, T, r, market_price, option_type='call', refine=1):
+        """
+        Volatilité implicite approchée, mêmes entrées et même format de sortie que implied_volatility_batch
+        (dict vol, iterations, status). Les cotations hors du domaine de la table (ou non inversibles)
+        sont confiées au solveur exact.
+        """
+        from scipy.special import ndtr
+        is_call = option_type_mask(option_type)
+        S, K, T, r, price, is_call = np.broadcast_arrays(
+            np.asarray(S, dtype=float), np.asarray(K, dtype=float), np.asarray(T, dtype=float),
+            np.asarray(r, dtype=float), np.asarray(market_price, dtype=float), is_call)
+        shape = S.shape
+        S, K, T, r, price, is_call = (np.ravel(a) for a in (S, K, T, r, price, is_call))
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            u, q = _normalize(S, K, T, r, price, is_call)
+            s = self.lookup(u, q)
+            for _ in range(refine):
+                # Newton sur q(s) = N(d1) - e^u N(d2), dq/ds = φ(d1) ; la perte relative par
+                # annulation reste de l'ordre de u/s² × 1e-16 sur le domaine de la table
+                d1 = -u / s + 0.5 * s
+                model = ndtr(d1) - np.exp(u) * ndtr(d1 - s)
+                s = s - (model - q) * np.exp(0.5 * d1 * d1) * SQRT_2PI
+            vol = s / np.sqrt(T)
+
+        served = np.isfinite(vol) & (vol > 0) & (T > 0)
+        iterations = np.full(vol.shape, refine)
+        status = np.array([IV_STATUS_OK], dtype=object).repeat(vol.size)  # np.full(..., dtype=object) : ~10x plus lent
+        fallback = np.flatnonzero(~served)
+        if fallback.size:
+            exact = implied_volatility_batch(S[fallback], K[fallback], T[fallback], r[fallback], price[fallback],
+                                             is_call[fallback])
+            vol[fallback], iterations[fallback], status[fallback] = exact['vol'], exact['iterations'], exact['status']
+        return {'vol': vol.reshape(shape), 'iterations': iterations.reshape(shape), 'status': status.reshape(shape)}
+
+def get_table(path=DEFAULT_TABLE_PATH):
+    """Table partagée : chargée depuis path, ou construite puis sauvegardée au premier appel."""
+    global _table
+    if _table is None:
+        if os.path.exists(path):
+            _table = ImpliedVolTable.load(path)
+        else:
+            _table = ImpliedVolTable.build()
+            _table.save(path)
+    return _table
+
+def implied_volatility_approx(S, K, T, r, market_price, option_type='call', refine=1):
+    """Raccourci vers la table partagée (voir ImpliedVolTable.implied_volatility)."""
+    return get_table().implied_volatility(S, K, T, r, market_price, option_type, refine)
+
+def _random_book(n, seed):
+    """Cotations de screening aléatoires (mêmes plages que le book de benchmarks.py)."""
+    rng = np.random.default_rng(seed)
+    book = {'S': np.full(n, 100.0), 'K': rng.uniform(60, 140, n), 'T': rng.uniform(0.05, 2.0, n),
+            'r': np.full(n, 0.02), 'vol': rng.uniform(0.1, 0.6, n)}
+    is_call = rng.random(n) < 0.5
+    price = black_scholes_batch(book['S'], book['K'], book['T'], book['r'], book['vol'], is_call)['price']
+    return book, is_call, price
+
+def validate(table, n=1_000_000, refine=1, seed=0, verbose=True):
+    """
+    Mode validation : inverse n cotations aléatoires avec la table et avec le solveur exact.
+    Retourne les erreurs relatives sur la vol (max, p99, médiane) des cotations identifiables,
+    la part servie par la table et le débit des deux méthodes (ns par option).
+    """
+    book, is_call, price = _random_book(n, seed)
+    args = (book['S'], book['K'], book['T'], book['r'], price, is_call)
+
+    start = time.perf_counter()
+    approx = table.implied_volatility(*args, refine=refine)
+    approx_ns = (time.perf_counter() - start) / n * 1e9
+    start = time.perf_counter()
+    exact = implied_volatility_batch(*args)
+    exact_ns = (time.perf_counter() - start) / n * 1e9
+
+    # Référence : la vol ayant servi à calculer le prix. Les cotations dont le prix est trop petit pour
+    # déterminer la vol (le solveur exact lui-même s'en écarte de plus de IDENTIFIABLE_TOL) sont exclues.
+    exact_error = np.abs(exact['vol'] / book['vol'] - 1)
+    ok = (exact['status'] == IV_STATUS_OK) & (exact_error < IDENTIFIABLE_TOL)
+    error = np.abs(approx['vol'][ok] / book['vol'][ok] - 1)
+    report = {
+        'refine': refine,
+        'n': n,
+        'max_rel_error': float(np.max(error)),
+        'p99_rel_error': float(np.percentile(error, 99)),
+        'median_rel_error': float(np.median(error)),
+        'identifiable_share': float(np.mean(ok)),
+        'table_share': float(np.mean(approx['iterations'] == refine)),
+        'approx_ns_per_option': approx_ns,
+        'exact_ns_per_option': exact_ns,
+    }
+    if verbose:
+        print(f"refine={refine} : erreur relative max {report['max_rel_error']:.2e}, "
+              f"p99 {report['p99_rel_error']:.2e} sur {report['identifiable_share'] * 100:.1f} % des cotations | "
+              f"table {report['table_share'] * 100:.1f} % | "
+              f"{approx_ns:.0f} ns/option contre {exact_ns:.0f} ns/option ({exact_ns / approx_ns:.1f}x)")
+    return report
+
+def _summary(report):
+    return {key: report[key] for key in ('max_rel_error', 'p99_rel_error', 'median_rel_error')}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Table d'inversion rapide de la volatilité implicite.")
+    parser.add_argument('--path', default=DEFAULT_TABLE_PATH)
+    parser.add_argument('--build', action='store_true', help="(Re)construit et sauvegarde la table")
+    parser.add_argument('--validate', action='store_true', help="Compare la table au solveur exact")
+    parser.add_argument('--size', type=int, nargs=2, default=DEFAULT_SIZE, help="Nœuds en √u et en √(-2 ln q)")
+    parser.add_argument('-n', type=int, default=1_000_000, help="Nombre de cotations de validation")
+    args = parser.parse_args()
+
+    if args.build or not os.path.exists(args.path):
+        start = time.perf_counter()
+        table = ImpliedVolTable.build(tuple(args.size))
+        table.save(args.path)
+        print(f"Table {args.size[0]}x{args.size[1]} construite en {time.perf_counter() - start:.1f} s : {args.path}")
+        for name, bounds in table.errors.items():
+            print(f"  {name} : erreur relative max {bounds['max_rel_error']:.2e}, p99 {bounds['p99_rel_error']:.2e}")
+    else:
+        table = ImpliedVolTable.load(args.path)
+
+    if args.validate:
+        for refine in (0, 1):
+            validate(table, args.n, refine)
@@ -0,0 +1,200 @@
+"""
+batch_pricer.py
+---------------
+Revalorisation non interactive d'un fichier de positions (CSV ou Parquet), en flux.
+
+Fonctionnalités :
+- Lecture du fichier de positions par blocs (mémoire constante)
+- Données de marché (spot, volatilité, taux) résolues une seule fois par sous-jacent via data_fetcher
+- Prix, Greeks et volatilité implicite (si un prix de marché est fourni) calculés de façon vectorisée
+- Écriture incrémentale des résultats enrichis (CSV ou Parquet, schéma de sortie déclaré)
+- Une position invalide (sous-jacent sans données, type inconnu) est signalée sur sa ligne
+  (colonnes status et error) sans interrompre le traitement du fichier
+
+Colonnes attendues : ticker, strike, maturity (en années), type (call/put), quantity,
+market_price (optionnelle).
+
+Usage :
+    python batch_pricer.py positions.csv resultats.parquet --chunk-size 200000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from black_scholes import black_scholes_batch, implied_volatility_batch
+from data_fetcher import get_universe_data
+
+DEFAULT_CHUNK_SIZE = 100_000
+REQUIRED_COLUMNS = ('ticker', 'strike', 'maturity', 'type', 'quantity')
+# Types des colonnes connues en sortie (les autres colonnes du fichier gardent le type déduit du premier bloc)
+RESULT_TYPES = {
+    'ticker': 'string', 'strike': 'float64', 'maturity': 'float64', 'type': 'string', 'quantity': 'float64',
+    'market_price': 'float64', 'spot': 'float64', 'vol': 'float64', 'r': 'float64',
+    'price': 'float64', 'delta': 'float64', 'gamma': 'float64', 'vega': 'float64', 'theta': 'float64',
+    'rho': 'float64', 'market_value': 'float64', 'position_delta': 'float64',
+    'implied_vol': 'float64', 'iv_status': 'string', 'status': 'string', 'error': 'string',
+}
+
+def iter_positions(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Itère sur le fichier de positions par blocs de chunk_size lignes."""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+class MarketInputs:
+    """Spot, volatilité et taux par sous-jacent, récupérés une seule fois pour tout le fichier."""
+
+    def __init__(self, period='1y'):
+        self.period = period
+        self.table = pd.DataFrame({'spot': [], 'vol': [], 'r': [], 'status': [], 'error': []})
+
+    def resolve(self, tickers):
+        """
+        Récupère (en parallèle) les sous-jacents encore inconnus et retourne la table complète :
+        spot, vol, r, et status ('ok' ou 'error') / error (message) issus de get_universe_data.
+        """
+        missing = [t for t in pd.unique(tickers) if t not in self.table.index]
+        if missing:
+            data = get_universe_data(missing, self.period).set_index('Ticker')
+            new = pd.DataFrame({
+                'spot': data['Spot Price (USD)'].astype(float),
+                'vol': data['Volatility (%)'].astype(float) / 100,
+                'r': data['Risk-Free Rate (%)'].astype(float) / 100,
+                'status': data['Status'],
+                'error': data['Error'],
+            }, index=data.index)
+            self.table = pd.concat([self.table, new]) if len(self.table) else new
+        return self.table
+
+def price_positions(positions, market):
+    """
+    Enrichit un bloc de positions avec données de marché, prix, Greeks et volatilité implicite.
+
+    Les positions dont le sous-jacent n'a pas de données de marché ou dont le type n'est ni call ni put
+    sont conservées avec des résultats NaN, status = 'error' et le motif dans error.
+    """
+    missing = [c for c in REQUIRED_COLUMNS if c not in positions.columns]
+    if missing:
+        raise ValueError(f"Colonnes manquantes dans le fichier de positions : {missing}")
+
+    positions = positions.copy()
+    positions['ticker'] = positions['ticker'].astype(str).str.upper()
+    positions['type'] = positions['type'].astype(str).str.lower()
+    inputs = market.resolve(positions['ticker']).reindex(positions['ticker'])
+    for column in ('spot', 'vol', 'r'):
+        positions[column] = inputs[column].to_numpy()
+
+    market_ok = (inputs['status'] == 'ok').to_numpy()
+    valid_type = positions['type'].isin(['call', 'put']).to_numpy()
+    error = np.where(market_ok, '', 'données de marché indisponibles : '
+                     + inputs['error'].fillna('sous-jacent inconnu').astype(str).to_numpy()).astype(object)
+    error[~valid_type] = 'type invalide : ' + positions['type'].to_numpy()[~valid_type] + " (call ou put attendu)"
+    valid = market_ok & valid_type
+    is_call = positions['type'].to_numpy() == 'call'
+
+    results = black_scholes_batch(positions['spot'].to_numpy(), positions['strike'].to_numpy(float),
+                                  positions['maturity'].to_numpy(float), positions['r'].to_numpy(),
+                                  positions['vol'].to_numpy(), is_call)
+    quantity = positions['quantity'].to_numpy(float)
+    for name, values in results.items():
+        positions[name] = np.where(valid, values, np.nan)
+    positions['market_value'] = positions['price'] * quantity
+    positions['position_delta'] = positions['delta'] * quantity
+
+    if 'market_price' in positions.columns:
+        quoted = positions['market_price'].notna().to_numpy() & valid
+        iv = np.full(len(positions), np.nan)
+        status = np.full(len(positions), '', dtype=object)
+        if quoted.any():
+            solved = implied_volatility_batch(positions['spot'].to_numpy()[quoted],
+                                              positions['strike'].to_numpy(float)[quoted],
+                                              positions['maturity'].to_numpy(float)[quoted],
+                                              positions['r'].to_numpy()[quoted],
+                                              positions['market_price'].to_numpy(float)[quoted],
+                                              is_call[quoted])
+            iv[quoted] = solved['vol']
+            status[quoted] = solved['status']
+        positions['implied_vol'] = iv
+        positions['iv_status'] = status
+
+    positions['status'] = np.where(valid, 'ok', 'error')
+    positions['error'] = error
+    return positions
+
+def result_schema(frame):
+    """
+    Schéma Parquet des résultats : types déclarés (RESULT_TYPES) pour les colonnes connues, type déduit
+    du bloc pour les autres (chaîne si le bloc ne contient que des valeurs manquantes). Évite qu'un bloc
+    ultérieur aux types déduits différents (entiers/flottants, colonne vide) ne puisse être écrit.
+    """
+    import pyarrow as pa
+    fields = []
+    for field in pa.Schema.from_pandas(frame, preserve_index=False):
+        if field.name in RESULT_TYPES:
+            field = field.with_type(pa.type_for_alias(RESULT_TYPES[field.name]))
+        elif frame[field.name].isna().all():
+            field = field.with_type(pa.string())
+        fields.append(field)
+    return pa.schema(fields)
+
+class ResultWriter:
+    """
+    Écrit les blocs enrichis au fil de l'eau (CSV en ajout, Parquet par groupes de lignes).
+    schema : fonction bloc -> schéma pyarrow, appelée sur le premier bloc (défaut : schéma déduit du bloc).
+    """
+
+    def __init__(self, path, schema=None):
+        self.path = path
+        self.parquet = path.endswith('.parquet')
+        self.schema = schema
+        self.writer = None
+        self.rows = 0
+
+    def write(self, frame):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            if self.writer is None:
+                schema = self.schema(frame) if self.schema else pa.Schema.from_pandas(frame, preserve_index=False)
+                self.writer = pq.ParquetWriter(self.path, schema)
+            # Colonnes texte du schéma converties explicitement (valeurs lues comme nombres ou NaN dans ce bloc)
+            text = [f.name for f in self.writer.schema if pa.types.is_string(f.type) and f.name in frame.columns]
+            table = pa.Table.from_pandas(frame.astype({name: 'string' for name in text}),
+                                         schema=self.writer.schema, preserve_index=False)
+            self.writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode='w' if self.rows == 0 else 'a', header=self.rows == 0, index=False)
+        self.rows += len(frame)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+def run_batch(input_path, output_path, chunk_size=DEFAULT_CHUNK_SIZE, period='1y'):
+    """Revalorise tout le fichier de positions et retourne le nombre de lignes écrites."""
+    market = MarketInputs(period)
+    writer = ResultWriter(output_path, result_schema)
+    start = time.perf_counter()
+    try:
+        for chunk in iter_positions(input_path, chunk_size):
+            writer.write(price_positions(chunk, market))
+            print(f"{writer.rows} position(s) valorisée(s) ({time.perf_counter() - start:.1f} s)")
+    finally:
+        writer.close()
+    return writer.rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Revalorisation d'un fichier de positions (Black-Scholes).")
+    parser.add_argument('input', help="Fichier de positions (.csv ou .parquet)")
+    parser.add_argument('output', help="Fichier de résultats (.csv ou .parquet)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--period', default='1y', help="Période de calcul de la volatilité historique")
+    args = parser.parse_args()
+
+    rows = run_batch(args.input, args.output, args.chunk_size, args.period)
+    print(f"Terminé : {rows} position(s) écrite(s) dans {args.output}")
@@ -0,0 +1,203 @@
+"""
+benchmarks.py
+-------------
+Suite de benchmarks des chemins critiques du pricing, avec suivi des régressions.
+
+Fonctionnalités :
+- Mesure des fonctions de pricing, Greeks, volatilité implicite, Monte Carlo et smile
+- Entrées scalaires et tableaux, débit (options/s, trajectoires/s) et pic mémoire
+- Résultats enregistrés en JSON (une exécution par fichier)
+- Comparaison à une exécution de référence et signalement des régressions
+
+Usage :
+    python benchmarks.py --output bench_results/apres.json --compare bench_results/avant.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+DEFAULT_MIN_TIME = 0.2      # durée minimale (s) d'une série de mesures
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.10    # ralentissement relatif au-delà duquel on signale une régression
+ARRAY_SIZE = 100_000
+
+def _book(n=ARRAY_SIZE, seed=0):
+    """Book d'options aléatoire, reproductible."""
+    rng = np.random.default_rng(seed)
+    return {
+        'S': np.full(n, 100.0),
+        'K': rng.uniform(60, 140, n),
+        'T': rng.uniform(0.05, 2.0, n),
+        'r': np.full(n, 0.02),
+        'vol': rng.uniform(0.1, 0.6, n),
+    }
+
+def _cases():
+    """
+    Cas de benchmark : nom -> (fonction sans argument, unité de débit, nombre d'unités par appel[, préparation]).
+    Les imports sont faits ici pour que leur coût ne soit pas mesuré. La préparation optionnelle (sans
+    argument) n'est exécutée, hors mesure, que si le cas est sélectionné.
+    """
+    import pandas as pd
+    from black_scholes import (black_scholes_price, black_scholes_greeks, black_scholes_batch,
+                               implied_volatility, implied_volatility_batch)
+    from monte_carlo import simulate_paths, monte_carlo_call_price, monte_carlo_greeks
+    from vol_smile import generate_smile
+    from plotter import greeks_vs_spot
+    from scenario_risk import run_scenarios, scenario_grid
+    from approx_tables import ImpliedVolTable
+
+    book = _book()
+    portfolio = pd.DataFrame({'ticker': np.resize(['AAA', 'BBB', 'CCC', 'DDD'], 10_000), 'strike': book['K'][:10_000],
+                              'maturity': book['T'][:10_000], 'type': 'call', 'quantity': 1.0,
+                              'spot': 100.0, 'vol': book['vol'][:10_000], 'r': 0.02})
+    grid = scenario_grid()
+    approx = {}
+
+    def build_approx_table():
+        # Table construite en mémoire, sans validation ni écriture de fichier
+        approx['table'] = ImpliedVolTable.build(validate_points=0)
+
+    market = black_scholes_batch(**book)['price']
+    deep_otm = black_scholes_price(100, 160, 0.25, 0.02, 0.25)
+    near_expiry = black_scholes_price(100, 101, 2 / 365, 0.02, 0.25)
+
+    return {
+        'bs_price_scalar': (lambda: black_scholes_price(100, 105, 0.5, 0.02, 0.25), 'options', 1),
+        'bs_price_array': (lambda: black_scholes_price(book['S'], book['K'], book['T'], book['r'], book['vol']),
+                           'options', ARRAY_SIZE),
+        'bs_greeks_scalar': (lambda: black_scholes_greeks(100, 105, 0.5, 0.02, 0.25), 'options', 1),
+        'bs_greeks_array': (lambda: black_scholes_greeks(book['S'], book['K'], book['T'], book['r'], book['vol']),
+                            'options', ARRAY_SIZE),
+        'bs_batch_array': (lambda: black_scholes_batch(**book), 'options', ARRAY_SIZE),
+        'iv_scalar_atm': (lambda: implied_volatility(100, 100, 0.5, 0.02, 7.0), 'options', 1),
+        'iv_scalar_deep_otm': (lambda: implied_volatility(100, 160, 0.25, 0.02, deep_otm), 'options', 1),
+        'iv_scalar_near_expiry': (lambda: implied_volatility(100, 101, 2 / 365, 0.02, near_expiry), 'options', 1),
+        'iv_batch_array': (lambda: implied_volatility_batch(book['S'], book['K'], book['T'], book['r'], market),
+                           'options', ARRAY_SIZE),
+        'iv_approx_array': (lambda: approx['table'].implied_volatility(book['S'], book['K'], book['T'], book['r'],
+                                                                       market),
+                            'options', ARRAY_SIZE, build_approx_table),
+        'simulate_paths_1k_x_252': (lambda: simulate_paths(100, 0.02, 0.25, 1.0, 252, 1_000), 'paths', 1_000),
+        'simulate_paths_10k_x_252': (lambda: simulate_paths(100, 0.02, 0.25, 1.0, 252, 10_000), 'paths', 10_000),
+        'simulate_paths_50k_x_52': (lambda: simulate_paths(100, 0.02, 0.25, 1.0, 52, 50_000), 'paths', 50_000),
+        'mc_call_price_10k': (lambda: monte_carlo_call_price(100, 105, 0.02, 0.25, 0.5, plot_paths=False),
+                              'paths', 10_000),
+        'mc_greeks_pathwise_1m': (lambda: monte_carlo_greeks(100, 105, 0.02, 0.25, 0.5, seed=0), 'paths', 1_000_000),
+        'generate_smile_20': (lambda: generate_smile(100, 0.5, 0.02, 0.25), 'options', 20),
+        'scenario_grid_10k_positions': (lambda: run_scenarios(portfolio, grid), 'options', 10_000 * len(grid)),
+        'greeks_vs_spot_200': (lambda: greeks_vs_spot(100, 105, 0.5, 0.02, 0.25), 'options', 200),
+    }
+
+def time_case(fn, min_time=DEFAULT_MIN_TIME, repeat=DEFAULT_REPEAT):
+    """Meilleur temps par appel (s) sur repeat séries d'au moins min_time secondes."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / repeat:
+            break
+        number *= 2
+
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+def peak_memory(fn):
+    """Pic d'allocation (octets) pendant un appel, mesuré par tracemalloc."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def run_benchmarks(selected=None, min_time=DEFAULT_MIN_TIME, repeat=DEFAULT_REPEAT):
+    """Exécute les benchmarks (tous, ou ceux dont le nom contient un des filtres) et retourne les résultats."""
+    results = {}
+    for name, (fn, unit, units, *setup) in _cases().items():
+        if selected and not any(s in name for s in selected):
+            continue
+        try:
+            for prepare in setup:
+                prepare()
+            seconds = time_case(fn, min_time, repeat)
+            results[name] = {
+                'seconds_per_call': seconds,
+                'throughput': units / seconds,
+                'unit': f'{unit}/s',
+                'peak_memory_bytes': peak_memory(fn),
+            }
+        except Exception as e:
+            # Un échec (ex : non-convergence de la volatilité implicite) est un résultat en soi
+            results[name] = {'error': f'{type(e).__name__}: {e}'}
+        print(_format_line(name, results[name]))
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'machine': {'python': sys.version.split()[0], 'numpy': np.__version__,
+                    'platform': platform.platform(), 'cpu_count': os.cpu_count()},
+        'results': results,
+    }
+
+def _format_line(name, result):
+    if 'error' in result:
+        return f"{name:<28} ERREUR : {result['error']}"
+    return (f"{name:<28} {result['seconds_per_call'] * 1e6:12.1f} µs/appel  "
+            f"{result['throughput']:14,.0f} {result['unit']:<10} "
+            f"{result['peak_memory_bytes'] / 2**20:8.2f} Mo")
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare deux exécutions et retourne la liste des régressions :
+    (nom, temps de référence, temps actuel, ralentissement relatif).
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        reference = baseline['results'].get(name)
+        if not reference or 'error' in reference or 'error' in result:
+            continue
+        change = result['seconds_per_call'] / reference['seconds_per_call'] - 1
+        marker = 'RÉGRESSION' if change > threshold else ('amélioration' if change < -threshold else '')
+        print(f"{name:<28} {change * 100:+8.1f} %  {marker}")
+        if change > threshold:
+            regressions.append((name, reference['seconds_per_call'], result['seconds_per_call'], change))
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks des chemins critiques du pricing.")
+    parser.add_argument('--output', default=None, help="Fichier JSON de résultats (défaut : bench_results/<date>.json)")
+    parser.add_argument('--compare', default=None, help="Fichier JSON de référence pour détecter les régressions")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--filter', nargs='*', default=None, help="Ne lancer que les cas dont le nom contient ces motifs")
+    parser.add_argument('--min-time', type=float, default=DEFAULT_MIN_TIME)
+    args = parser.parse_args()
+
+    run = run_benchmarks(args.filter, args.min_time)
+
+    output = args.output or os.path.join('bench_results', f"{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(run, f, indent=2)
+    print(f"\nRésultats enregistrés dans {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\n=== Comparaison avec {args.compare} (seuil {args.threshold * 100:.0f} %) ===")
+        regressions = compare(run, baseline, args.threshold)
+        sys.exit(1 if regressions else 0)
@@ -7,63 +7,330 @@ Fonctionnalités :
 - Calcul du prix (call/put)
 - Calcul des Greeks (Delta, Gamma, Vega, Theta, Rho)
 - Estimation de la volatilité implicite (méthode de Newton-Raphson)
+- Pricing vectorisé d'un book complet (prix + Greeks en une passe)
+- Volatilité implicite vectorisée pour une chaîne complète (Newton sécurisé par bissection)
 """
 
+import math
 import numpy as np
-from scipy.stats import norm
+import metrics
+
+_INV_SQRT_2PI = 1.0 / np.sqrt(2.0 * np.pi)
+_SQRT_2 = math.sqrt(2.0)
+_SCALAR_TYPES = (int, float, np.integer, np.floating)
+
+def _ndtr(x):
+    """
+    Fonction de répartition de la loi normale (vectorisée).
+    scipy.special n'est importé qu'au premier appel : le chemin scalaire n'en dépend pas.
+    """
+    from scipy.special import ndtr
+    return ndtr(x)
+
+def _norm_cdf(x):
+    """Fonction de répartition de la loi normale pour un scalaire (math.erfc, sans NumPy)."""
+    return 0.5 * math.erfc(-x / _SQRT_2)
+
+def _is_scalar(*args):
+    return all(isinstance(a, _SCALAR_TYPES) for a in args)
+
+def _scalar_d1_d2(S, K, T, r, vol):
+    vol_sqrt_T = vol * math.sqrt(T)
+    d1 = (math.log(S / K) + (r + 0.5 * vol * vol) * T) / vol_sqrt_T
+    return d1, d1 - vol_sqrt_T
+
+def _scalar_price(S, K, T, r, vol, option_type):
+    d1, d2 = _scalar_d1_d2(S, K, T, r, vol)
+    if option_type == 'call':
+        return S * _norm_cdf(d1) - K * math.exp(-r * T) * _norm_cdf(d2)
+    return K * math.exp(-r * T) * _norm_cdf(-d2) - S * _norm_cdf(-d1)
+
+def _scalar_greeks(S, K, T, r, vol, option_type):
+    d1, d2 = _scalar_d1_d2(S, K, T, r, vol)
+    sqrt_T = math.sqrt(T)
+    pdf_d1 = math.exp(-0.5 * d1 * d1) * _INV_SQRT_2PI
+    discount_K = K * math.exp(-r * T)
+
+    gamma = pdf_d1 / (S * vol * sqrt_T)
+    vega = S * pdf_d1 * sqrt_T / 100
+    if option_type == 'call':
+        delta = _norm_cdf(d1)
+        theta = (-S * pdf_d1 * vol / (2 * sqrt_T) - r * discount_K * _norm_cdf(d2)) / 365
+        rho = K * T * math.exp(-r * T) * _norm_cdf(d2) / 100
+    else:
+        delta = _norm_cdf(d1) - 1
+        theta = (-S * pdf_d1 * vol / (2 * sqrt_T) + r * discount_K * _norm_cdf(-d2)) / 365
+        rho = -K * T * math.exp(-r * T) * _norm_cdf(-d2) / 100
+    return delta, gamma, vega, theta, rho
 
 def black_scholes_price(S, K, T, r, vol, option_type='call'):
     """
     Prix théorique d'une option européenne avec Black-Scholes.
+    Les entrées scalaires passent par un chemin rapide en pur Python (module math).
     """
+    if option_type not in ('call', 'put'):
+        raise ValueError("option_type doit être 'call' ou 'put'.")
+
+    if _is_scalar(S, K, T, r, vol):
+        try:
+            return _scalar_price(S, K, T, r, vol, option_type)
+        except (ValueError, ZeroDivisionError, OverflowError):
+            pass  # cas dégénérés (vol nulle, T nul...) : comportement NumPy (inf/nan)
+
     d1 = (np.log(S / K) + (r + 0.5 * vol**2) * T) / (vol * np.sqrt(T))
     d2 = d1 - vol * np.sqrt(T)
 
     if option_type == 'call':
-        return S * norm.cdf(d1) - K * np.exp(-r * T) * norm.cdf(d2)
-    elif option_type == 'put':
-        return K * np.exp(-r * T) * norm.cdf(-d2) - S * norm.cdf(-d1)
-    else:
-        raise ValueError("option_type doit être 'call' ou 'put'.")
+        return S * _ndtr(d1) - K * np.exp(-r * T) * _ndtr(d2)
+    return K * np.exp(-r * T) * _ndtr(-d2) - S * _ndtr(-d1)
 
 def black_scholes_greeks(S, K, T, r, vol, option_type='call'):
     """
     Calcul des principaux Greeks : Delta, Gamma, Vega, Theta, Rho.
+    Les entrées scalaires passent par un chemin rapide en pur Python (module math).
     """
+    if _is_scalar(S, K, T, r, vol):
+        try:
+            return _scalar_greeks(S, K, T, r, vol, option_type)
+        except (ValueError, ZeroDivisionError, OverflowError):
+            pass
+
     d1 = (np.log(S / K) + (r + 0.5 * vol**2) * T) / (vol * np.sqrt(T))
     d2 = d1 - vol * np.sqrt(T)
+    pdf_d1 = np.exp(-0.5 * d1**2) * _INV_SQRT_2PI
 
-    delta = norm.cdf(d1) if option_type == 'call' else norm.cdf(d1) - 1
-    gamma = norm.pdf(d1) / (S * vol * np.sqrt(T))
-    vega = S * norm.pdf(d1) * np.sqrt(T) / 100  # variation du prix pour 1% de vol
-    theta = (-S * norm.pdf(d1) * vol / (2 * np.sqrt(T)) -
-             r * K * np.exp(-r * T) * (norm.cdf(d2) if option_type == 'call' else norm.cdf(-d2))) / 365
-    rho = (K * T * np.exp(-r * T) * norm.cdf(d2) / 100) if option_type == 'call' \
-          else (-K * T * np.exp(-r * T) * norm.cdf(-d2) / 100)
+    delta = _ndtr(d1) if option_type == 'call' else _ndtr(d1) - 1
+    gamma = pdf_d1 / (S * vol * np.sqrt(T))
+    vega = S * pdf_d1 * np.sqrt(T) / 100  # variation du prix pour 1% de vol
+    theta = (-S * pdf_d1 * vol / (2 * np.sqrt(T)) -
+             r * K * np.exp(-r * T) * _ndtr(d2)) / 365 if option_type == 'call' \
+            else (-S * pdf_d1 * vol / (2 * np.sqrt(T)) +
+                  r * K * np.exp(-r * T) * _ndtr(-d2)) / 365
+    rho = (K * T * np.exp(-r * T) * _ndtr(d2) / 100) if option_type == 'call' \
+          else (-K * T * np.exp(-r * T) * _ndtr(-d2) / 100)
 
     return delta, gamma, vega, theta, rho
 
+def option_type_mask(option_type):
+    """
+    Convertit option_type (chaîne, tableau de chaînes ou masque booléen) en masque « est un call ».
+    """
+    if isinstance(option_type, str):
+        if option_type not in ('call', 'put'):
+            raise ValueError("option_type doit être 'call' ou 'put'.")
+        return np.bool_(option_type == 'call')
+
+    types = np.asarray(option_type)
+    if types.dtype == bool:
+        return types
+
+    types = np.char.lower(types.astype(str))
+    if not np.all((types == 'call') | (types == 'put')):
+        raise ValueError("option_type doit être 'call' ou 'put'.")
+    return types == 'call'
+
+@metrics.timed('black_scholes_batch')
+def black_scholes_batch(S, K, T, r, vol, option_type='call', as_frame=False):
+    """
+    Prix et Greeks Black-Scholes pour un book complet d'options, en une seule passe.
+
+    Les entrées sont des scalaires ou des tableaux NumPy (broadcasting). option_type
+    accepte 'call'/'put', un tableau de chaînes ou un masque booléen (True = call),
+    ce qui permet de valoriser un book mixte sans boucle Python.
+    d1, d2, les fonctions de répartition et l'actualisation ne sont calculés qu'une fois.
+
+    Retourne un dict de tableaux (price, delta, gamma, vega, theta, rho), ou un
+    DataFrame si as_frame=True. Les conventions d'unités sont celles de black_scholes_greeks.
+    """
+    is_call = option_type_mask(option_type)
+    S, K, T, r, vol, is_call = np.broadcast_arrays(
+        np.asarray(S, dtype=float), np.asarray(K, dtype=float), np.asarray(T, dtype=float),
+        np.asarray(r, dtype=float), np.asarray(vol, dtype=float), is_call)
+
+    sqrt_T = np.sqrt(T)
+    vol_sqrt_T = vol * sqrt_T
+    d1 = (np.log(S / K) + (r + 0.5 * vol**2) * T) / vol_sqrt_T
+    d2 = d1 - vol_sqrt_T
+
+    # sign = +1 pour un call, -1 pour un put : N(sign*d) évite les pertes de précision de 1 - N(d)
+    sign = np.where(is_call, 1.0, -1.0)
+    discount_K = K * np.exp(-r * T)
+    n_d1 = _ndtr(sign * d1)
+    n_d2 = _ndtr(sign * d2)
+    pdf_d1 = np.exp(-0.5 * d1**2) * _INV_SQRT_2PI
+
+    result = {
+        'price': sign * (S * n_d1 - discount_K * n_d2),
+        'delta': sign * n_d1,
+        'gamma': pdf_d1 / (S * vol_sqrt_T),
+        'vega': S * pdf_d1 * sqrt_T / 100,
+        'theta': (-S * pdf_d1 * vol / (2 * sqrt_T) - sign * r * discount_K * n_d2) / 365,
+        'rho': sign * T * discount_K * n_d2 / 100,
+    }
+
+    if as_frame:
+        import pandas as pd
+        return pd.DataFrame({name: np.ravel(values) for name, values in result.items()})
+    return result
+
 def implied_volatility(S, K, T, r, market_price, option_type='call', tol=1e-5, max_iter=100):
     """
     Estimation de la volatilité implicite à partir d'un prix de marché.
     Méthode : Newton-Raphson avec dérivée Vega.
     """
     vol = 0.2  # estimation initiale
+    reason, detail = 'max_iter', f"nombre maximal d'itérations atteint ({max_iter})"
 
     for i in range(max_iter):
-        price = black_scholes_price(S, K, T, r, vol, option_type)
-        vega = black_scholes_greeks(S, K, T, r, vol, option_type)[2] * 100
+        if _is_scalar(S, K, T, r, vol):
+            # Chemin rapide : prix et vega en une seule évaluation de d1/d2
+            try:
+                d1, _ = _scalar_d1_d2(S, K, T, r, vol)
+                price = _scalar_price(S, K, T, r, vol, option_type)
+                vega = S * math.exp(-0.5 * d1 * d1) * _INV_SQRT_2PI * math.sqrt(T)
+            except (ValueError, ZeroDivisionError, OverflowError):
+                reason, detail = 'invalid_input', f"entrées invalides pour vol={vol:.6g}"
+                break
+        else:
+            price = black_scholes_price(S, K, T, r, vol, option_type)
+            vega = black_scholes_greeks(S, K, T, r, vol, option_type)[2] * 100
 
         if vega == 0:
+            reason, detail = 'zero_vega', f"vega nulle pour vol={vol:.6g}"
             break
 
         diff = price - market_price
         if abs(diff) < tol:
+            if metrics.ENABLED:
+                metrics.observe('iv_iterations', i + 1, buckets=metrics.COUNT_BUCKETS, solver='newton')
             return round(vol, 6)
 
         vol -= diff / vega
 
-    raise ValueError("Échec de convergence de la volatilité implicite.")
+    if metrics.ENABLED:
+        metrics.inc('iv_failures', solver='newton', reason=reason)
+    raise ValueError(f"Échec de convergence de la volatilité implicite : {detail} "
+                     f"(S={S}, K={K}, T={T}, prix de marché={market_price}, {option_type}).")
+
+# Bornes de recherche et codes de statut du solveur vectorisé de volatilité implicite
+IV_VOL_MIN = 1e-6
+IV_VOL_MAX = 10.0
+IV_STATUS_OK = 'ok'
+IV_STATUS_INVALID = 'invalid_input'
+IV_STATUS_BELOW_INTRINSIC = 'below_intrinsic'
+IV_STATUS_ABOVE_BOUND = 'above_upper_bound'
+IV_STATUS_NO_CONVERGENCE = 'no_convergence'
+
+def _price_and_vega(S, K, T, r, vol, sign):
+    """
+    Prix et vega (non normalisée, dPrix/dVol) pour le solveur de volatilité implicite.
+    """
+    sqrt_T = np.sqrt(T)
+    vol_sqrt_T = vol * sqrt_T
+    d1 = (np.log(S / K) + (r + 0.5 * vol**2) * T) / vol_sqrt_T
+    d2 = d1 - vol_sqrt_T
+    price = sign * (S * _ndtr(sign * d1) - K * np.exp(-r * T) * _ndtr(sign * d2))
+    vega = S * np.exp(-0.5 * d1**2) * _INV_SQRT_2PI * sqrt_T
+    return price, vega
+
+def _initial_vol_guess(S, K, T, r, call_price):
+    """
+    Estimation initiale de Corrado-Miller (extension de Brenner-Subrahmanyam hors de la monnaie).
+    """
+    X = K * np.exp(-r * T)
+    excess = call_price - 0.5 * (S - X)
+    root = np.sqrt(np.maximum(excess**2 - (S - X)**2 / np.pi, 0.0))
+    guess = (np.sqrt(2 * np.pi) * excess + root) / (np.sqrt(T) * (S + X))
+    guess = np.where(np.isfinite(guess), guess, 0.2)
+    return np.clip(guess, 1e-3, 5.0)
+
+@metrics.timed('implied_volatility_batch')
+def implied_volatility_batch(S, K, T, r, market_price, option_type='call', tol=1e-8, max_iter=100,
+                             as_frame=False, initial_vol=None):
+    """
+    Volatilité implicite vectorisée pour une chaîne d'options complète.
+
+    Méthode : Newton-Raphson sécurisé par un encadrement [vol_bas, vol_haut] mis à jour à chaque
+    itération ; lorsque le pas de Newton sort de l'encadrement (vega quasi nulle, options très
+    dans/hors de la monnaie), on se replie sur une bissection. Chaque contrat a son propre masque
+    de convergence, seuls les contrats encore actifs sont réévalués.
+    initial_vol : point de départ optionnel par contrat (ex : dernière vol résolue) ; les valeurs
+    NaN ou hors de [IV_VOL_MIN, IV_VOL_MAX] sont remplacées par l'estimation de Corrado-Miller.
+
+    Retourne un dict de tableaux : vol (NaN en cas d'échec), iterations et status
+    ('ok', 'invalid_input', 'below_intrinsic', 'above_upper_bound', 'no_convergence').
+    """
+    is_call = option_type_mask(option_type)
+    S, K, T, r, price, is_call = np.broadcast_arrays(
+        np.asarray(S, dtype=float), np.asarray(K, dtype=float), np.asarray(T, dtype=float),
+        np.asarray(r, dtype=float), np.asarray(market_price, dtype=float), is_call)
+    shape = S.shape
+    S, K, T, r, price, is_call = (np.ravel(a) for a in (S, K, T, r, price, is_call))
+    if initial_vol is not None:
+        initial_vol = np.ravel(np.broadcast_to(np.asarray(initial_vol, dtype=float), shape))
+
+    sign = np.where(is_call, 1.0, -1.0)
+    discount_K = K * np.exp(-r * T)
+    intrinsic = np.maximum(sign * (S - discount_K), 0.0)
+    upper_bound = np.where(is_call, S, discount_K)
+
+    vol = np.full(S.shape, np.nan)
+    iterations = np.zeros(S.shape, dtype=int)
+    status = np.full(S.shape, IV_STATUS_NO_CONVERGENCE, dtype=object)
+
+    valid = (S > 0) & (K > 0) & (T > 0) & np.isfinite(price) & np.isfinite(r)
+    status[~valid] = IV_STATUS_INVALID
+    below = valid & (price <= intrinsic)
+    status[below] = IV_STATUS_BELOW_INTRINSIC
+    above = valid & ~below & (price >= upper_bound)
+    status[above] = IV_STATUS_ABOVE_BOUND
+
+    idx = np.flatnonzero(valid & ~below & ~above)
+    # Parité call-put pour l'estimation initiale des puts
+    call_price = price[idx] + np.where(is_call[idx], 0.0, S[idx] - discount_K[idx])
+    sigma = _initial_vol_guess(S[idx], K[idx], T[idx], r[idx], call_price)
+    if initial_vol is not None:
+        warm = initial_vol[idx]
+        usable = np.isfinite(warm) & (warm > IV_VOL_MIN) & (warm < IV_VOL_MAX)
+        sigma = np.where(usable, warm, sigma)
+    lo = np.full(idx.shape, IV_VOL_MIN)
+    hi = np.full(idx.shape, IV_VOL_MAX)
+
+    for i in range(1, max_iter + 1):
+        if idx.size == 0:
+            break
+
+        model, vega = _price_and_vega(S[idx], K[idx], T[idx], r[idx], sigma, sign[idx])
+        diff = model - price[idx]
+        iterations[idx] = i
+
+        done = (np.abs(diff) < tol) | (hi - lo < tol * 1e-2)
+        vol[idx[done]] = sigma[done]
+        status[idx[done]] = IV_STATUS_OK
+
+        # Le prix est croissant en vol : on resserre l'encadrement
+        hi = np.where(diff > 0, sigma, hi)
+        lo = np.where(diff < 0, sigma, lo)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = sigma - diff / vega
+        in_bracket = (newton > lo) & (newton < hi) & np.isfinite(newton)
+        sigma = np.where(in_bracket, newton, 0.5 * (lo + hi))
+
+        keep = ~done
+        idx, sigma, lo, hi = idx[keep], sigma[keep], lo[keep], hi[keep]
+
+    if metrics.ENABLED:
+        for name, count in zip(*np.unique(status, return_counts=True)):
+            metrics.inc('iv_contracts', int(count), solver='batch', status=name)
+        metrics.observe_many('iv_iterations', iterations[status == IV_STATUS_OK], solver='batch')
+
+    vol, iterations, status = vol.reshape(shape), iterations.reshape(shape), status.reshape(shape)
+    if as_frame:
+        import pandas as pd
+        return pd.DataFrame({'vol': np.ravel(vol), 'iterations': np.ravel(iterations),
+                             'status': np.ravel(status)})
+    return {'vol': vol, 'iterations': iterations, 'status': status}
 
 if __name__ == "__main__":
     S = 100
@@ -3,17 +3,41 @@ data_fetcher.py
 ---------------
 Récupère automatiquement les données de marché pour un actif : prix spot, volatilité, rendement moyen, volume, taux sans risque.
 Permet aussi de sauvegarder les résultats dans un fichier CSV.
+Un univers complet de tickers peut être récupéré en parallèle et écrit en une fois (CSV ou Parquet).
 """
 
-import yfinance as yf
 import numpy as np
 import pandas as pd
 import logging
+from market_data import DEFAULT_RISK_FREE_RATE, get_history, get_risk_free_rate
 
 # Configuration du logger (en cas d'erreur réseau, API, etc.)
 logging.basicConfig(filename='fetcher_log.txt', level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
 
-DEFAULT_RISK_FREE_RATE = 0.04  # Taux sans risque par défaut (4%) si non disponible
+def _risk_free_rate_pct():
+    """Taux 10Y américain (^TNX) en pourcentage, ou le taux par défaut si indisponible ou en erreur."""
+    try:
+        return get_risk_free_rate() * 100
+    except Exception as e:
+        logging.error(f"Erreur pour ^TNX, taux par défaut utilisé : {e}")
+        return DEFAULT_RISK_FREE_RATE * 100
+
+def _summarize_history(ticker, hist, risk_free_rate):
+    """Indicateurs de marché d'un actif à partir de son historique."""
+    spot_price = hist['Close'].iloc[-1]
+    returns = hist['Close'].pct_change().dropna()
+    vol = returns.std() * np.sqrt(252) * 100
+    avg_return = returns.mean() * 100
+    avg_volume = hist['Volume'].mean()
+
+    return {
+        'Ticker': ticker,
+        'Spot Price (USD)': round(spot_price, 2),
+        'Volatility (%)': round(vol, 2),
+        'Avg Daily Return (%)': round(avg_return, 4),
+        'Avg Daily Volume': int(avg_volume),
+        'Risk-Free Rate (%)': round(risk_free_rate, 2)
+    }
 
 def get_stock_data(ticker, period='1y'):
     """
@@ -21,39 +45,61 @@ def get_stock_data(ticker, period='1y'):
     Retourne : prix spot, volatilité annualisée, rendement moyen, volume moyen, taux sans risque.
     """
     try:
-        stock = yf.Ticker(ticker)
-        hist = stock.history(period=period)
+        hist = get_history(ticker, period)
 
         if hist.empty:
             raise ValueError(f"Aucune donnée disponible pour {ticker} sur la période {period}")
 
-        spot_price = hist['Close'].iloc[-1]
-        returns = hist['Close'].pct_change().dropna()
-        vol = returns.std() * np.sqrt(252) * 100
-        avg_return = returns.mean() * 100
-        avg_volume = hist['Volume'].mean()
-
-        # Récupération du taux 10Y américain (^TNX)
-        tnx = yf.Ticker("^TNX").history(period="1d")
-        if tnx.empty:
-            risk_free_rate = DEFAULT_RISK_FREE_RATE * 100
-        else:
-            risk_free_rate = tnx['Close'].iloc[-1] / 10  # Yahoo donne le taux multiplié par 10
-
-        return {
-            'Ticker': ticker,
-            'Spot Price (USD)': round(spot_price, 2),
-            'Volatility (%)': round(vol, 2),
-            'Avg Daily Return (%)': round(avg_return, 4),
-            'Avg Daily Volume': int(avg_volume),
-            'Risk-Free Rate (%)': round(risk_free_rate, 2)
-        }
+        return _summarize_history(ticker, hist, _risk_free_rate_pct())
 
     except Exception as e:
         logging.error(f"Erreur pour {ticker}: {e}")
         print(f"Erreur lors de la récupération des données : {e}")
         return None
 
+def get_universe_data(tickers, period='1y', max_workers=16):
+    """
+    Récupère les indicateurs de marché d'un univers de tickers en parallèle.
+
+    Les historiques sont téléchargés par un pool de threads borné (max_workers) ; le taux sans
+    risque n'est récupéré qu'une fois pour tout le lot. Retourne un DataFrame avec une ligne par
+    ticker, et les colonnes 'Status' ('ok' ou 'error') et 'Error' (message, vide si succès).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    risk_free_rate = _risk_free_rate_pct()
+
+    def fetch(ticker):
+        try:
+            hist = get_history(ticker, period)
+            if hist.empty:
+                raise ValueError(f"Aucune donnée disponible pour {ticker} sur la période {period}")
+            return {**_summarize_history(ticker, hist, risk_free_rate), 'Status': 'ok', 'Error': ''}
+        except Exception as e:
+            logging.error(f"Erreur pour {ticker}: {e}")
+            return {'Ticker': ticker, 'Status': 'error', 'Error': str(e)}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        rows = list(executor.map(fetch, dict.fromkeys(tickers)))
+
+    return pd.DataFrame(rows, columns=['Ticker', 'Spot Price (USD)', 'Volatility (%)', 'Avg Daily Return (%)',
+                                       'Avg Daily Volume', 'Risk-Free Rate (%)', 'Status', 'Error'])
+
+def save_frame(df, filename='universe_summary.csv'):
+    """
+    Écrit un DataFrame en une seule opération : Parquet (colonnaire) si l'extension est .parquet, CSV sinon.
+    Contrairement à save_to_csv, le fichier est remplacé et non complété.
+    """
+    try:
+        if filename.endswith('.parquet'):
+            df.to_parquet(filename, index=False)
+        else:
+            df.to_csv(filename, index=False)
+        print(f"{len(df)} ligne(s) sauvegardée(s) dans {filename}")
+    except Exception as e:
+        logging.error(f"Erreur de sauvegarde dans {filename}: {e}")
+        print(f"Erreur lors de la sauvegarde : {e}")
+
 def save_to_csv(data, filename='data_summary.csv'):
     """
     Sauvegarde les données dans un fichier CSV. Ajoute la ligne sans écraser les précédentes.
@@ -0,0 +1,365 @@
+"""
+historical_vol.py
+-----------------
+Volatilité historique multi-estimateurs, mise à jour incrémentale sur un historique local.
+
+Fonctionnalités :
+- Historique OHLCV local par ticker (CSV complété en fin de fichier) : seules les nouvelles barres
+  depuis la dernière mise à jour sont téléchargées, hors barre de la séance en cours (encore partielle)
+- Estimateurs : close-to-close glissant, EWMA (RiskMetrics), Parkinson, Garman-Klass et Yang-Zhang
+- État vectorisé sur tout l'univers (tampons circulaires et sommes glissantes) : une mise à jour
+  coûte O(nouvelles barres), quelle que soit la longueur de la fenêtre ou de l'historique
+  (sommes recalculées exactement toutes les window barres, pour borner l'erreur d'arrondi)
+- Téléchargements via la couche market_data (cache partagé)
+- État sauvegardé sur disque (.npz) et reconstructible à partir des historiques locaux
+
+Usage :
+    python historical_vol.py AAPL MSFT NVDA --window 63 --output vols.csv
+"""
+
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import metrics
+from market_data import get_history
+
+DEFAULT_ROOT = os.environ.get('PRICING_HISTORY_DIR', 'price_history')
+DEFAULT_WINDOW = 63          # barres de la fenêtre glissante
+DEFAULT_EWMA_LAMBDA = 0.94   # RiskMetrics
+DEFAULT_INITIAL_PERIOD = '1y'
+TRADING_DAYS = 252
+OHLC = ['Open', 'High', 'Low', 'Close']
+ESTIMATORS = ('close_to_close', 'ewma', 'parkinson', 'garman_klass', 'yang_zhang')
+STATE_FILE = 'state.npz'
+
+# Termes par barre conservés dans les tampons : rendement close-to-close, rendement overnight
+# (ouverture / clôture précédente), rendement open-to-close, ln(H/L)² et terme de Rogers-Satchell
+N_TERMS = 5
+# Sommes glissantes : Σcc, Σcc², Σon, Σon², Σoc, Σoc², Σln(H/L)², Σrs
+N_SUMS = 8
+
+def _bar_terms(prev_close, open_, high, low, close):
+    """Termes (m, N_TERMS) d'un lot de barres, à partir de la clôture précédente de chaque ticker."""
+    log_h, log_l, log_c = np.log(high / open_), np.log(low / open_), np.log(close / open_)
+    return np.column_stack([
+        np.log(close / prev_close),
+        np.log(open_ / prev_close),
+        log_c,
+        (log_h - log_l)**2,
+        log_h * (log_h - log_c) + log_l * (log_l - log_c),
+    ])
+
+def _moments(terms):
+    """Contribution (m, N_SUMS) de chaque barre aux sommes glissantes."""
+    cc, on, oc, hl2, rs = terms.T
+    return np.column_stack([cc, cc * cc, on, on * on, oc, oc * oc, hl2, rs])
+
+def _sample_var(total, total_sq, n):
+    return (total_sq - total * total / n) / (n - 1)
+
+def _normalize_bars(hist):
+    """Barres OHLC indexées par date (sans fuseau horaire), triées et dédoublonnées."""
+    if hist.empty:
+        return pd.DataFrame(columns=OHLC + ['Volume'], index=pd.DatetimeIndex([], name='Date'))
+    bars = hist.reindex(columns=OHLC + ['Volume']).copy()
+    bars.index = pd.to_datetime(bars.index, utc=True).tz_convert(None).normalize().rename('Date')
+    bars = bars[~bars.index.duplicated(keep='last')].sort_index()
+    bars = bars[bars['Close'] > 0]
+    # Barre sans ouverture/plus haut/plus bas : on la réduit à sa clôture (termes de range nuls)
+    for column in ('Open', 'High', 'Low'):
+        bars[column] = bars[column].where(bars[column] > 0, bars['Close'])
+    return bars
+
+
+class HistoricalVolEngine:
+    """
+    Estimateurs de volatilité historique pour un univers de tickers, mis à jour par ajout de barres.
+
+    Pour chaque ticker, les N_TERMS termes des window dernières barres sont gardés dans un tampon
+    circulaire, et leurs sommes sont mises à jour à chaque barre (ajout de la nouvelle, retrait de celle
+    qui sort de la fenêtre). Toutes les opérations portent sur des tableaux (tickers en lignes) : une barre
+    par ticker et par pas, quel que soit le nombre de tickers. Les ajouts et retraits successifs accumulant
+    des erreurs d'arrondi, les sommes d'un ticker sont recalculées à partir de son tampon toutes les window
+    barres (coût amorti O(1) par barre).
+    """
+
+    def __init__(self, root=DEFAULT_ROOT, window=DEFAULT_WINDOW, ewma_lambda=DEFAULT_EWMA_LAMBDA,
+                 initial_period=DEFAULT_INITIAL_PERIOD):
+        self.root = root
+        self.window = window
+        self.ewma_lambda = ewma_lambda
+        self.initial_period = initial_period
+        self._slots = {}
+        self._allocate(0)
+        if root:
+            os.makedirs(root, exist_ok=True)
+            self._load()
+
+    def _allocate(self, n):
+        self._tickers = np.empty(n, dtype=object)
+        self._buffer = np.zeros((n, self.window, N_TERMS))
+        self._head = np.zeros(n, dtype=np.intp)
+        self._count = np.zeros(n, dtype=np.intp)
+        self._sums = np.zeros((n, N_SUMS))
+        self._since_resum = np.zeros(n, dtype=np.intp)  # barres ajoutées depuis le dernier recalcul exact
+        self._ewma_var = np.full(n, np.nan)
+        self._last_close = np.full(n, np.nan)
+        self._last_date = np.full(n, np.datetime64('NaT'), dtype='datetime64[D]')
+
+    def _slot_for(self, tickers):
+        """Indices des tickers dans l'état, en ajoutant des lignes pour les nouveaux."""
+        new = [t for t in dict.fromkeys(tickers) if t not in self._slots]
+        if new:
+            n = len(self._slots)
+            grown = {name: getattr(self, name) for name in ('_tickers', '_buffer', '_head', '_count', '_sums',
+                                                            '_since_resum', '_ewma_var', '_last_close',
+                                                            '_last_date')}
+            self._allocate(n + len(new))
+            for name, values in grown.items():
+                getattr(self, name)[:n] = values
+            for i, ticker in enumerate(new, start=n):
+                self._slots[ticker] = i
+                self._tickers[i] = ticker
+        return np.array([self._slots[t] for t in tickers], dtype=np.intp)
+
+    @property
+    def tickers(self):
+        """Tickers suivis par le moteur."""
+        return list(self._slots)
+
+    # --- Persistance -------------------------------------------------------------------------
+
+    def _history_path(self, ticker):
+        return os.path.join(self.root, f'{ticker}.csv')
+
+    def _state_path(self):
+        return os.path.join(self.root, STATE_FILE)
+
+    def save(self):
+        """Sauvegarde l'état des estimateurs (remplacement atomique du fichier)."""
+        if not self.root:
+            return
+        tmp = self._state_path() + '.tmp.npz'
+        np.savez(tmp, tickers=self._tickers.astype(str), buffer=self._buffer, head=self._head, count=self._count,
+                 sums=self._sums, ewma_var=self._ewma_var, last_close=self._last_close, last_date=self._last_date,
+                 params=np.array([self.window, self.ewma_lambda]))
+        os.replace(tmp, self._state_path())
+
+    def _load(self):
+        path = self._state_path()
+        if os.path.exists(path):
+            with np.load(path) as data:
+                if tuple(data['params']) == (self.window, self.ewma_lambda):
+                    tickers = list(data['tickers'])
+                    self._slot_for(tickers)
+                    for name in ('buffer', 'head', 'count', 'sums', 'ewma_var', 'last_close', 'last_date'):
+                        getattr(self, f'_{name}')[:] = data[name]
+                    return
+        # Paramètres modifiés ou état absent : reconstruction à partir des historiques locaux
+        tickers = [f[:-len('.csv')] for f in sorted(os.listdir(self.root)) if f.endswith('.csv')]
+        if tickers:
+            self.rebuild(tickers)
+
+    def history(self, ticker):
+        """Historique OHLCV local d'un ticker."""
+        path = self._history_path(ticker)
+        if not os.path.exists(path):
+            return _normalize_bars(pd.DataFrame())
+        return _normalize_bars(pd.read_csv(path, index_col=0, parse_dates=True))
+
+    def rebuild(self, tickers=None):
+        """Recalcule l'état des tickers à partir de leur historique local (ex : après un changement de fenêtre)."""
+        tickers = self.tickers if tickers is None else [t.upper() for t in tickers]
+        rows = self._slot_for(tickers)
+        self._buffer[rows] = 0.0
+        self._head[rows] = self._count[rows] = 0
+        self._sums[rows] = 0.0
+        self._since_resum[rows] = 0
+        self._ewma_var[rows] = self._last_close[rows] = np.nan
+        self._last_date[rows] = np.datetime64('NaT')
+        self._apply(dict(zip(tickers, (self.history(t) for t in tickers))))
+        self.save()
+
+    # --- Mise à jour -------------------------------------------------------------------------
+
+    def _apply(self, new_bars):
+        """
+        Intègre les nouvelles barres (dict ticker -> DataFrame OHLC trié) dans l'état.
+        Les tickers sont traités ensemble, une barre par pas : le k-ième pas ajoute la k-ième
+        nouvelle barre de chaque ticker qui en a au moins k.
+        """
+        new_bars = {t: bars for t, bars in new_bars.items() if len(bars)}
+        if not new_bars:
+            return
+        rows = self._slot_for(list(new_bars))
+        lengths = np.array([len(bars) for bars in new_bars.values()])
+        stacked = pd.concat(list(new_bars.values()))
+        # Disposition (ticker, k-ième nouvelle barre) : une seule conversion pour tout l'univers
+        owner = np.repeat(np.arange(len(rows)), lengths)
+        step = np.arange(len(stacked)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        depth = int(lengths.max())
+        values = np.full((len(rows), depth, len(OHLC)), np.nan)
+        dates = np.full((len(rows), depth), np.datetime64('NaT'), dtype='datetime64[D]')
+        values[owner, step] = stacked[OHLC].to_numpy(float)
+        dates[owner, step] = stacked.index.to_numpy().astype('datetime64[D]')
+
+        lam = self.ewma_lambda
+        for k in range(depth):
+            present = ~np.isnat(dates[:, k])
+            idx, (open_, high, low, close) = rows[present], values[present, k].T
+            prev = self._last_close[idx]
+            self._last_close[idx] = close
+            self._last_date[idx] = dates[present, k]
+
+            # La toute première barre d'un ticker ne sert qu'à fixer la clôture précédente
+            has_prev = np.isfinite(prev)
+            idx = idx[has_prev]
+            terms = _bar_terms(prev[has_prev], open_[has_prev], high[has_prev], low[has_prev], close[has_prev])
+
+            head = self._head[idx]
+            leaving = self._buffer[idx, head]
+            full = (self._count[idx] == self.window)[:, None]
+            self._sums[idx] += _moments(terms) - np.where(full, _moments(leaving), 0.0)
+            self._buffer[idx, head] = terms
+            self._head[idx] = (head + 1) % self.window
+            self._count[idx] = np.minimum(self._count[idx] + 1, self.window)
+            self._since_resum[idx] += 1
+            self._resum(idx[self._since_resum[idx] >= self.window])
+
+            r2 = terms[:, 0]**2
+            var = self._ewma_var[idx]
+            self._ewma_var[idx] = np.where(np.isnan(var), r2, lam * var + (1 - lam) * r2)
+
+    def _resum(self, idx):
+        """Recalcule exactement les sommes glissantes des lignes idx à partir de leur tampon."""
+        if idx.size:
+            # Les cases non remplies du tampon sont nulles et ne contribuent pas aux sommes
+            moments = _moments(self._buffer[idx].reshape(-1, N_TERMS)).reshape(idx.size, self.window, N_SUMS)
+            self._sums[idx] = moments.sum(axis=1)
+            self._since_resum[idx] = 0
+
+    def _fetch(self, ticker):
+        """
+        Nouvelles barres d'un ticker depuis la dernière mise à jour (tout initial_period si inconnu).
+        La barre datée du jour (UTC) est écartée : pendant la séance elle est partielle, et une barre
+        enregistrée n'est jamais corrigée. Elle est intégrée à la mise à jour suivante.
+        """
+        today = np.datetime64('today', 'D')
+        row = self._slots.get(ticker)
+        last = self._last_date[row] if row is not None else np.datetime64('NaT')
+        if np.isnat(last):
+            hist = get_history(ticker, self.initial_period)
+        else:
+            first = last + np.timedelta64(1, 'D')
+            if first >= today:
+                return _normalize_bars(pd.DataFrame())
+            hist = get_history(ticker, start=str(first))
+
+        bars = _normalize_bars(hist)
+        bars = bars[bars.index < pd.Timestamp(today)]
+        if np.isnat(last):
+            if bars.empty:
+                raise ValueError(f"Aucune donnée disponible pour {ticker} sur la période {self.initial_period}")
+            return bars
+        return bars[bars.index > pd.Timestamp(last)]
+
+    def update(self, tickers, max_workers=16):
+        """
+        Met à jour les estimateurs d'un univers de tickers.
+
+        Les nouvelles barres sont téléchargées par un pool de threads borné, ajoutées aux historiques
+        locaux puis intégrées à l'état en une passe vectorisée. Seules les séances terminées sont
+        intégrées (la barre du jour attend la mise à jour suivante). Retourne estimates(tickers) avec les colonnes new_bars,
+        'Status' ('ok' ou 'error') et 'Error'.
+        """
+        tickers = list(dict.fromkeys(t.upper() for t in tickers))
+
+        def fetch(ticker):
+            try:
+                return ticker, self._fetch(ticker), ''
+            except Exception as e:
+                logging.error(f"Erreur pour {ticker}: {e}")
+                return ticker, None, str(e)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(fetch, tickers))
+
+        new_bars = {ticker: bars for ticker, bars, _ in results if bars is not None}
+        if self.root:
+            for ticker, bars in new_bars.items():
+                if len(bars):
+                    path = self._history_path(ticker)
+                    bars.to_csv(path, mode='a', header=not os.path.exists(path))
+        self._apply(new_bars)
+        self.save()
+        metrics.inc('hist_vol_bars', sum(len(b) for b in new_bars.values()))
+
+        report = self.estimates(tickers)
+        report['new_bars'] = [len(new_bars[t]) if t in new_bars else 0 for t in tickers]
+        errors = {ticker: error for ticker, bars, error in results if bars is None}
+        report['Status'] = ['error' if t in errors else 'ok' for t in tickers]
+        report['Error'] = [errors.get(t, '') for t in tickers]
+        return report
+
+    # --- Estimateurs -------------------------------------------------------------------------
+
+    def estimates(self, tickers=None):
+        """
+        Volatilités annualisées (en décimal) par ticker, calculées à partir des sommes glissantes.
+        Fenêtre incomplète : les estimateurs utilisent les barres disponibles (NaN sous 2 barres).
+        """
+        tickers = self.tickers if tickers is None else [t.upper() for t in tickers]
+        known = np.array([t in self._slots for t in tickers], dtype=bool)
+        rows = np.array([self._slots.get(t, 0) for t in tickers], dtype=np.intp)
+
+        n = np.where(known, self._count[rows], 0).astype(float)
+        s_cc, s_cc2, s_on, s_on2, s_oc, s_oc2, s_hl2, s_rs = self._sums[rows].T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            var_cc = _sample_var(s_cc, s_cc2, n)
+            var_on = _sample_var(s_on, s_on2, n)
+            var_oc = _sample_var(s_oc, s_oc2, n)
+            k = 0.34 / (1.34 + (n + 1) / (n - 1))
+            variances = {
+                'close_to_close': var_cc,
+                'ewma': self._ewma_var[rows],
+                'parkinson': s_hl2 / (4 * np.log(2) * n),
+                'garman_klass': (0.5 * s_hl2 - (2 * np.log(2) - 1) * s_oc2) / n,
+                'yang_zhang': var_on + k * var_oc + (1 - k) * s_rs / n,
+            }
+        valid = known & (n >= 2)
+        frame = pd.DataFrame({
+            'ticker': tickers,
+            'as_of': np.where(known, self._last_date[rows], np.datetime64('NaT')),
+            'bars': n.astype(int),
+            'close': np.where(known, self._last_close[rows], np.nan),
+        })
+        for name in ESTIMATORS:
+            # Une somme glissante peut garder un résidu d'arrondi très légèrement négatif
+            frame[name] = np.where(valid, np.sqrt(np.maximum(variances[name], 0.0) * TRADING_DAYS), np.nan)
+        return frame
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Volatilité historique incrémentale d'un univers de tickers.")
+    parser.add_argument('tickers', nargs='*', help="Tickers (défaut : tous ceux de l'historique local)")
+    parser.add_argument('--root', default=DEFAULT_ROOT, help="Répertoire des historiques locaux et de l'état")
+    parser.add_argument('--window', type=int, default=DEFAULT_WINDOW)
+    parser.add_argument('--ewma-lambda', type=float, default=DEFAULT_EWMA_LAMBDA)
+    parser.add_argument('--period', default=DEFAULT_INITIAL_PERIOD, help="Historique initial d'un nouveau ticker")
+    parser.add_argument('--max-workers', type=int, default=16)
+    parser.add_argument('--output', default=None, help="Fichier de résultats (.csv ou .parquet)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    engine = HistoricalVolEngine(args.root, args.window, args.ewma_lambda, args.period)
+    report = engine.update(args.tickers or engine.tickers, args.max_workers)
+    print(f"{len(report)} ticker(s), {report['new_bars'].sum()} nouvelle(s) barre(s) "
+          f"en {time.perf_counter() - start:.1f} s\n")
+    print(report.to_string(index=False, float_format=lambda x: f'{x:.4f}'))
+    if args.output:
+        from data_fetcher import save_frame
+        save_frame(report, args.output)
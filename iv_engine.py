@@ -0,0 +1,310 @@
+"""
+iv_engine.py
+------------
+Moteur incrémental de volatilité implicite alimenté par un flux de cotations d'options.
+
+Fonctionnalités :
+- État par contrat : dernière cotation résolue, volatilité implicite, statut et nombre d'itérations
+- Seuls les contrats dont la cotation (ou le spot, la maturité, le taux) a bougé au-delà d'une tolérance
+  (exprimée en volatilité via la vega de la dernière inversion) sont réinversés, en repartant de leur dernière volatilité (démarrage à chaud de Newton)
+- Publication des smiles mis à jour (par sous-jacent, échéance et type) aux abonnés
+- Flux de cotations : relecture d'un enregistrement local (CSV/Parquet ou instantanés option_chains),
+  interrogation périodique du marché, enregistrement du flux pour relecture ultérieure
+
+Usage :
+    python iv_engine.py --replay option_snapshots
+    python iv_engine.py --ticker AAPL --interval 60 --record cotations.csv
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import metrics
+from black_scholes import implied_volatility_batch, IV_STATUS_OK
+
+DEFAULT_VOL_TOL = 1e-4            # variation de vol implicite induite par le prix (0,01 point)
+DEFAULT_SPOT_TOL = 1e-4           # variation relative du spot
+DEFAULT_TIME_TOL = 1 / (365 * 24)  # une heure, en années
+DEFAULT_RATE_TOL = 1e-6
+QUOTE_FIELDS = ('strike', 'T', 'type', 'spot', 'r')
+NUMERIC_FIELDS = ('strike', 'spot', 'r', 'T', 'price', 'vol', 'vega')
+
+def _vega(S, K, T, r, vol):
+    """Vega non normalisée (dPrix/dVol), NaN pour les contrats non inversés."""
+    sqrt_T = np.sqrt(T)
+    d1 = (np.log(S / K) + (r + 0.5 * vol**2) * T) / (vol * sqrt_T)
+    return S * np.exp(-0.5 * d1**2) / np.sqrt(2 * np.pi) * sqrt_T
+
+def _quote_arrays(quotes):
+    """
+    Colonnes d'un bloc de cotations sous forme de tableaux NumPy : prix (mid ou price), ticker,
+    expiry (par défaut la maturité T) et contractSymbol s'il est présent.
+    """
+    missing = [c for c in QUOTE_FIELDS if c not in quotes.columns]
+    if 'mid' not in quotes.columns and 'price' not in quotes.columns:
+        missing.append('mid')
+    if missing:
+        raise ValueError(f"Colonnes manquantes dans les cotations : {missing}")
+
+    n = len(quotes)
+    arrays = {name: quotes[name].to_numpy(float) for name in ('strike', 'spot', 'r', 'T')}
+    arrays['price'] = quotes['mid' if 'mid' in quotes.columns else 'price'].to_numpy(float)
+    arrays['type'] = quotes['type'].to_numpy(object)
+    if not ((arrays['type'] == 'call') | (arrays['type'] == 'put')).all():
+        arrays['type'] = quotes['type'].astype(str).str.lower().to_numpy(object)
+    arrays['ticker'] = quotes['ticker'].to_numpy(object) if 'ticker' in quotes.columns else np.full(n, '', object)
+    arrays['expiry'] = quotes['expiry'].astype(str).to_numpy(object) if 'expiry' in quotes.columns \
+        else np.round(arrays['T'], 6).astype(str).astype(object)
+    if 'as_of' in quotes.columns:
+        as_of = quotes['as_of']
+        if not pd.api.types.is_datetime64_any_dtype(as_of):
+            as_of = pd.to_datetime(as_of)
+        arrays['as_of'] = as_of.to_numpy('datetime64[ns]')
+    else:
+        arrays['as_of'] = np.full(n, np.datetime64('now', 'ns'))
+    if 'contractSymbol' in quotes.columns:
+        arrays['contractSymbol'] = quotes['contractSymbol'].to_numpy(object)
+    return arrays
+
+def _contract_keys(arrays):
+    """Clé de chaque contrat : contractSymbol, sinon 'ticker|échéance|type|strike'."""
+    if 'contractSymbol' in arrays:
+        return arrays['contractSymbol'].astype(str).astype(object)
+    return np.array([f'{ticker}|{expiry}|{option_type}|{strike!r}' for ticker, expiry, option_type, strike
+                     in zip(arrays['ticker'].tolist(), arrays['expiry'].tolist(), arrays['type'].tolist(),
+                            arrays['strike'].tolist())], dtype=object)
+
+class IncrementalIVEngine:
+    """
+    Volatilité implicite tenue à jour contrat par contrat.
+
+    L'état est stocké en colonnes NumPy (un emplacement par contrat, retrouvé par un index de hachage) et
+    conserve les entrées de la dernière inversion : une cotation n'est réinversée que si elle s'en
+    écarte au-delà des tolérances (prix : |Δprix| > vol_tol × vega, soit une variation de vol implicite
+    au premier ordre supérieure à vol_tol ; spot en relatif ; maturité et taux en absolu), de sorte que
+    de petites variations successives finissent par déclencher une réinversion.
+    subscribe(callback) enregistre une fonction appelée avec (ticker, expiry, type) et le smile
+    correspondant après chaque mise à jour qui le modifie.
+    """
+
+    def __init__(self, vol_tol=DEFAULT_VOL_TOL, spot_tol=DEFAULT_SPOT_TOL, time_tol=DEFAULT_TIME_TOL,
+                 rate_tol=DEFAULT_RATE_TOL, tol=1e-8, max_iter=100):
+        self.vol_tol, self.spot_tol, self.time_tol, self.rate_tol = vol_tol, spot_tol, time_tol, rate_tol
+        self.tol, self.max_iter = tol, max_iter
+        self.contracts = pd.Index([], dtype=object)   # contrat -> emplacement (position dans l'index)
+        self._layout = None                            # disposition du dernier bloc et emplacements associés
+        self.smiles = {}    # (ticker, expiry, type) -> identifiant de smile
+        self.size = 0
+        self.columns = self._allocate(0)
+        self.subscribers = []
+        self.stats = {'updates': 0, 'resolved': 0, 'skipped': 0, 'iterations': 0}
+
+    @staticmethod
+    def _allocate(capacity):
+        columns = {name: np.full(capacity, np.nan) for name in NUMERIC_FIELDS}
+        columns['iterations'] = np.zeros(capacity, dtype=int)
+        columns['smile'] = np.full(capacity, -1, dtype=int)
+        columns['as_of'] = np.full(capacity, np.datetime64('NaT'), dtype='datetime64[ns]')
+        for name in ('contract', 'status'):
+            columns[name] = np.full(capacity, None, dtype=object)
+        return columns
+
+    def _locate(self, arrays):
+        """
+        Lignes retenues du bloc (dernière cotation de chaque contrat, None si aucun doublon) et emplacement
+        de chaque contrat. Un flux de chaîne d'options garde en général la même disposition d'un bloc à
+        l'autre : dans ce cas les emplacements du bloc précédent sont réutilisés sans recalculer les clés.
+        """
+        fields = ('contractSymbol',) if 'contractSymbol' in arrays else ('ticker', 'expiry', 'type', 'strike')
+        layout = [arrays[name] for name in fields]
+        if self._layout is not None and len(layout) == len(self._layout[0]) \
+                and all(np.array_equal(a, b) for a, b in zip(layout, self._layout[0])):
+            return self._layout[1], self._layout[2]
+
+        contracts = _contract_keys(arrays)
+        duplicated = pd.Index(contracts).duplicated(keep='last')
+        keep = ~duplicated if duplicated.any() else None
+        subset = arrays if keep is None else {name: values[keep] for name, values in arrays.items()}
+        slots = self._slots_for(subset, contracts if keep is None else contracts[keep])
+        self._layout = ([a.copy() for a in layout], keep, slots)
+        return keep, slots
+
+    def _slots_for(self, arrays, contracts):
+        """Emplacements de contrats distincts (les nouveaux contrats sont ajoutés en fin de tableau)."""
+        slots = self.contracts.get_indexer(contracts)
+        new = np.flatnonzero(slots < 0)
+        if new.size == 0:
+            return slots
+
+        capacity = len(self.columns['vol'])
+        if self.size + new.size > capacity:
+            grown = self._allocate(max(self.size + new.size, 2 * capacity))
+            for name, values in self.columns.items():
+                grown[name][:capacity] = values
+            self.columns = grown
+
+        slots[new] = np.arange(self.size, self.size + new.size)
+        self.contracts = self.contracts.append(pd.Index(contracts[new], dtype=object))
+        self.columns['contract'][slots[new]] = contracts[new]
+        self.columns['smile'][slots[new]] = [
+            self.smiles.setdefault(key, len(self.smiles))
+            for key in zip(arrays['ticker'][new], arrays['expiry'][new], arrays['type'][new])]
+        self.size += new.size
+        return slots
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def update(self, quotes):
+        """
+        Intègre un bloc de cotations (DataFrame) et réinverse uniquement les contrats nouveaux ou modifiés.
+        Retourne les lignes recalculées (DataFrame indexé par contrat).
+        """
+        arrays = _quote_arrays(quotes)
+        keep, slots = self._locate(arrays)
+        if keep is not None:
+            arrays = {name: values[keep] for name, values in arrays.items()}
+
+        state = self.columns
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # vega NaN (contrat non inversé) : réinversé uniquement si sa cotation a changé
+            price_tol = self.vol_tol * np.nan_to_num(state['vega'][slots])
+            changed = ~(np.abs(arrays['price'] - state['price'][slots]) <= price_tol) \
+                | ~(np.abs(arrays['spot'] / state['spot'][slots] - 1) <= self.spot_tol) \
+                | ~(np.abs(arrays['T'] - state['T'][slots]) <= self.time_tol) \
+                | ~(np.abs(arrays['r'] - state['r'][slots]) <= self.rate_tol)
+        solved = slots[changed]
+
+        if solved.size:
+            for name in ('strike', 'spot', 'r', 'T', 'price', 'as_of'):
+                state[name][solved] = arrays[name][changed]
+            result = implied_volatility_batch(state['spot'][solved], state['strike'][solved], state['T'][solved],
+                                              state['r'][solved], state['price'][solved], arrays['type'][changed],
+                                              self.tol, self.max_iter, initial_vol=state['vol'][solved])
+            state['vol'][solved] = result['vol']
+            state['status'][solved] = result['status']
+            state['iterations'][solved] = result['iterations']
+            with np.errstate(invalid='ignore', divide='ignore'):
+                state['vega'][solved] = _vega(state['spot'][solved], state['strike'][solved], state['T'][solved],
+                                              state['r'][solved], state['vol'][solved])
+
+        n_solved, n_skipped = int(solved.size), int(slots.size - solved.size)
+        self.stats['updates'] += 1
+        self.stats['resolved'] += n_solved
+        self.stats['skipped'] += n_skipped
+        self.stats['iterations'] += int(state['iterations'][solved].sum())
+        if metrics.ENABLED:
+            metrics.inc('iv_engine_contracts', n_solved, outcome='resolved')
+            metrics.inc('iv_engine_contracts', n_skipped, outcome='skipped')
+            if n_solved:
+                metrics.observe_many('iv_iterations', state['iterations'][solved], solver='incremental')
+
+        if self.subscribers and n_solved:
+            touched = set(np.unique(state['smile'][solved]).tolist())
+            for key, smile_id in self.smiles.items():
+                if smile_id in touched:
+                    smile = self.smile(*key)
+                    for callback in self.subscribers:
+                        callback(key, smile)
+        return self._frame(solved)
+
+    def _frame(self, slots):
+        state = self.columns
+        return pd.DataFrame({name: state[name][slots] for name in ('strike', 'spot', 'r', 'T', 'price', 'vol',
+                                                                   'status', 'iterations', 'as_of')},
+                            index=pd.Index(state['contract'][slots], name='contract'))
+
+    @property
+    def state(self):
+        """État complet (un contrat par ligne)."""
+        return self._frame(np.arange(self.size))
+
+    def smile(self, ticker, expiry, option_type='call'):
+        """Smile courant (strike, vol, price, as_of) d'une échéance, restreint aux contrats inversés."""
+        smile_id = self.smiles.get((ticker, expiry, option_type))
+        state = self.columns
+        slots = np.flatnonzero((state['smile'][:self.size] == smile_id) & (state['status'][:self.size] == IV_STATUS_OK))
+        slots = slots[np.argsort(state['strike'][slots], kind='stable')]
+        return self._frame(slots)[['strike', 'vol', 'price', 'as_of']].reset_index()
+
+    def run(self, stream):
+        """Consomme un flux de blocs de cotations (ex : replay_quotes, poll_quotes) ; retourne les statistiques."""
+        for quotes in stream:
+            self.update(quotes)
+        return self.stats
+
+def replay_quotes(path, speed=None):
+    """
+    Relit un flux de cotations enregistré, un bloc par horodatage 'as_of' (ordre chronologique).
+
+    path : fichier CSV/Parquet (ex : produit par record_quotes) ou répertoire d'instantanés option_chains.
+    speed : None pour relire au plus vite, sinon facteur d'accélération par rapport au temps réel.
+    """
+    if os.path.isdir(path):
+        from option_chains import list_snapshots, load_snapshot
+        frames = [load_snapshot(p) for p in list_snapshots(path)]
+        quotes = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['as_of'])
+    elif path.endswith('.parquet'):
+        quotes = pd.read_parquet(path)
+    else:
+        quotes = pd.read_csv(path)
+
+    quotes['as_of'] = pd.to_datetime(quotes['as_of'])
+    previous = None
+    for as_of, block in quotes.sort_values('as_of', kind='stable').groupby('as_of', sort=True):
+        if speed and previous is not None:
+            time.sleep((as_of - previous).total_seconds() / speed)
+        previous = as_of
+        yield block.reset_index(drop=True)
+
+def poll_quotes(ticker, interval=60, stale_days=5, max_updates=None):
+    """
+    Flux en direct : un instantané nettoyé de la chaîne complète toutes les interval secondes.
+    Les données reprises du cache de market_data ont au plus interval secondes : chaque instantané
+    est retéléchargé au lieu de republier une chaîne encore valide pour le TTL du cache.
+    """
+    from option_chains import take_snapshot
+    count = 0
+    while max_updates is None or count < max_updates:
+        yield take_snapshot(ticker, stale_days, max_age=interval)
+        count += 1
+        time.sleep(interval)
+
+def record_quotes(stream, path):
+    """Enregistre chaque bloc du flux (CSV en ajout ou Parquet) tout en le transmettant, pour relecture ultérieure."""
+    from batch_pricer import ResultWriter
+    writer = ResultWriter(path)
+    try:
+        for quotes in stream:
+            writer.write(quotes)
+            yield quotes
+    finally:
+        writer.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Volatilité implicite incrémentale sur un flux de cotations.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--replay', help="Enregistrement à relire (CSV, Parquet ou répertoire d'instantanés)")
+    source.add_argument('--ticker', help="Sous-jacent à interroger périodiquement")
+    parser.add_argument('--interval', type=float, default=60, help="Intervalle d'interrogation (s)")
+    parser.add_argument('--speed', type=float, default=None, help="Accélération de la relecture (défaut : au plus vite)")
+    parser.add_argument('--record', default=None, help="Enregistre le flux reçu (CSV ou Parquet)")
+    parser.add_argument('--vol-tol', type=float, default=DEFAULT_VOL_TOL)
+    args = parser.parse_args()
+
+    stream = replay_quotes(args.replay, args.speed) if args.replay else poll_quotes(args.ticker.upper(), args.interval)
+    if args.record:
+        stream = record_quotes(stream, args.record)
+
+    engine = IncrementalIVEngine(vol_tol=args.vol_tol)
+    engine.subscribe(lambda key, smile: print(f"  smile {key[0]} {key[1]} {key[2]} : {len(smile)} strike(s), "
+                                              f"vol ATM ~ {smile['vol'].median() * 100:.2f} %"))
+    for quotes in stream:
+        start = time.perf_counter()
+        solved = engine.update(quotes)
+        print(f"{quotes['as_of'].iloc[0]} : {len(solved)}/{len(quotes)} contrat(s) réinversé(s) "
+              f"en {(time.perf_counter() - start) * 1000:.1f} ms")
+    print(f"Total : {engine.stats}")
@@ -0,0 +1,80 @@
+"""
+latency_budget.py
+-----------------
+Vérifie le budget de temps d'import et de latence par appel du cœur de calcul.
+
+Fonctionnalités :
+- Temps d'import de chaque module de calcul dans un interpréteur neuf
+- Contrôle qu'aucune dépendance lourde (matplotlib, yfinance, scipy, pandas) n'est chargée à l'import
+- Latence par appel des chemins scalaires (prix, Greeks, volatilité implicite)
+- Code de retour non nul si un budget est dépassé
+"""
+
+import subprocess
+import sys
+import timeit
+
+# Valeurs typiques sur un poste de développement : secondes pour les imports, microsecondes pour les
+# appels scalaires. Le budget vérifié leur applique BUDGET_MARGIN, pour absorber le bruit de mesure
+# et les machines d'intégration continue plus lentes ou chargées.
+BUDGET_MARGIN = 2.0
+TYPICAL_IMPORT_S = {
+    'black_scholes': 0.125,
+    'monte_carlo': 0.125,
+    'vol_smile': 0.125,
+    'plotter': 0.125,
+}
+TYPICAL_CALL_US = {
+    'black_scholes_price': 3.0,
+    'black_scholes_greeks': 5.0,
+    'implied_volatility': 20.0,
+}
+IMPORT_BUDGET_S = {module: typical * BUDGET_MARGIN for module, typical in TYPICAL_IMPORT_S.items()}
+CALL_BUDGET_US = {name: typical * BUDGET_MARGIN for name, typical in TYPICAL_CALL_US.items()}
+HEAVY_MODULES = ('matplotlib', 'yfinance', 'scipy', 'pandas')
+
+def measure_import(module):
+    """Temps d'import (s) d'un module dans un interpréteur neuf et dépendances lourdes chargées."""
+    code = (
+        "import sys, time\n"
+        "t = time.perf_counter()\n"
+        f"import {module}\n"
+        "print(time.perf_counter() - t)\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.split('\n')
+    return float(out[0]), [m for m in out[1].split(',') if m]
+
+def measure_calls(repeat=5, number=20000):
+    """Latence par appel (µs, meilleur de repeat mesures) des chemins scalaires."""
+    from black_scholes import black_scholes_price, black_scholes_greeks, implied_volatility
+
+    calls = {
+        'black_scholes_price': lambda: black_scholes_price(100, 105, 0.5, 0.02, 0.25, 'call'),
+        'black_scholes_greeks': lambda: black_scholes_greeks(100, 105, 0.5, 0.02, 0.25, 'call'),
+        'implied_volatility': lambda: implied_volatility(100, 105, 0.5, 0.02, 5.0, 'call'),
+    }
+    return {name: min(timeit.repeat(fn, repeat=repeat, number=number)) / number * 1e6 for name, fn in calls.items()}
+
+def check_budget():
+    """Affiche les mesures face au budget et retourne True si tout est respecté."""
+    ok = True
+
+    print("=== Temps d'import ===")
+    for module, budget in IMPORT_BUDGET_S.items():
+        seconds, heavy = measure_import(module)
+        passed = seconds <= budget and not heavy
+        ok &= passed
+        extra = f" (chargés : {', '.join(heavy)})" if heavy else ""
+        print(f"{'OK ' if passed else 'KO '} {module:<22} {seconds * 1000:8.1f} ms  / {budget * 1000:.0f} ms{extra}")
+
+    print("\n=== Latence par appel (scalaire) ===")
+    for name, micros in measure_calls().items():
+        passed = micros <= CALL_BUDGET_US[name]
+        ok &= passed
+        print(f"{'OK ' if passed else 'KO '} {name:<22} {micros:8.2f} µs / {CALL_BUDGET_US[name]:.0f} µs")
+
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if check_budget() else 1)
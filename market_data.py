@@ -0,0 +1,271 @@
+"""
+market_data.py
+--------------
+Couche d'accès aux données de marché partagée par tous les modules.
+
+Fonctionnalités :
+- Interface de fournisseur de données (yFinance par défaut, fichiers locaux pour les tests et les environnements hors ligne)
+- Cache LRU en mémoire et cache disque SQLite avec durée de vie (TTL) configurable
+- Déduplication des requêtes simultanées sur un même symbole
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+from datetime import date
+
+import metrics
+
+DEFAULT_TTL = 15 * 60  # durée de vie du cache (secondes)
+DEFAULT_RISK_FREE_RATE = 0.04  # taux sans risque par défaut (4 %) si ^TNX est indisponible
+DEFAULT_CACHE_PATH = os.environ.get('PRICING_CACHE_PATH', 'market_data_cache.sqlite')
+DEFAULT_MEMORY_SIZE = 256  # nombre d'entrées gardées en mémoire
+KEY_LOCK_STRIPES = 64  # verrous partagés par les clés (nombre fixe, quel que soit le nombre de symboles)
+
+def _is_empty(value):
+    """Résultat vide (forme des échecs de yFinance) : DataFrame vide, tuple vide ou de DataFrames vides."""
+    if isinstance(value, tuple):
+        return all(_is_empty(v) for v in value)
+    return bool(getattr(value, 'empty', False))
+
+def _detached(value):
+    """Copie des DataFrames retournés, pour que l'appelant ne modifie jamais l'objet gardé en cache."""
+    if isinstance(value, tuple):
+        return tuple(_detached(v) for v in value)
+    return value.copy() if hasattr(value, 'copy') and hasattr(value, 'empty') else value
+
+
+class YFinanceProvider:
+    """Fournisseur de données via yFinance (accès réseau)."""
+
+    def history(self, ticker, period='1y', start=None):
+        import yfinance as yf
+        if start is not None:
+            return yf.Ticker(ticker).history(start=start)
+        return yf.Ticker(ticker).history(period=period)
+
+    def expirations(self, ticker):
+        import yfinance as yf
+        return tuple(yf.Ticker(ticker).options)
+
+    def option_chain(self, ticker, expiry):
+        import yfinance as yf
+        chain = yf.Ticker(ticker).option_chain(expiry)
+        return chain.calls, chain.puts
+
+
+class LocalFileProvider:
+    """
+    Fournisseur de données lu sur disque, pour les tests et les exécutions sans réseau.
+
+    Arborescence attendue sous root :
+    - <TICKER>/history_<period>.csv (ou history.csv), indexé par date
+    - <TICKER>/calls_<AAAA-MM-JJ>.csv et <TICKER>/puts_<AAAA-MM-JJ>.csv
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, ticker, name):
+        return os.path.join(self.root, ticker.upper(), name)
+
+    def history(self, ticker, period='1y', start=None):
+        import pandas as pd
+
+        names = [f'history_{period}.csv', 'history.csv']
+        if start is not None:
+            names.reverse()  # historique complet en priorité pour une lecture à partir d'une date
+        paths = [p for p in (self._path(ticker, name) for name in names) if os.path.exists(p)]
+        if not paths:
+            return pd.DataFrame()
+        hist = pd.read_csv(paths[0], index_col=0, parse_dates=True)
+        if start is not None:
+            dates = pd.to_datetime(hist.index, utc=True).tz_convert(None).normalize()
+            hist = hist[dates >= pd.Timestamp(start)]
+        return hist
+
+    def expirations(self, ticker):
+        folder = os.path.join(self.root, ticker.upper())
+        if not os.path.isdir(folder):
+            return ()
+        names = [f[len('calls_'):-len('.csv')] for f in os.listdir(folder)
+                 if f.startswith('calls_') and f.endswith('.csv')]
+        return tuple(sorted(names))
+
+    def option_chain(self, ticker, expiry):
+        import pandas as pd
+        return (pd.read_csv(self._path(ticker, f'calls_{expiry}.csv')),
+                pd.read_csv(self._path(ticker, f'puts_{expiry}.csv')))
+
+
+class MarketDataCache:
+    """
+    Cache à deux niveaux (LRU mémoire + SQLite sur disque) avec TTL.
+
+    Les requêtes simultanées sur une même clé sont regroupées : un seul appel au fournisseur,
+    les autres threads attendent puis lisent le résultat en cache. Les résultats vides ne sont pas
+    conservés (nouvel essai à l'appel suivant) et les DataFrames sont retournés en copie.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, memory_size=DEFAULT_MEMORY_SIZE):
+        self.path = path
+        self.ttl = ttl
+        self.memory_size = memory_size
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = [threading.Lock() for _ in range(KEY_LOCK_STRIPES)]
+        if path:
+            with self._connect() as conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, stored REAL, value BLOB)")
+
+    @contextmanager
+    def _connect(self):
+        """Connexion SQLite validée puis fermée (le with de sqlite3 seul ne ferme pas la connexion)."""
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            yield conn
+
+    def _get(self, key, max_age=None):
+        now = time.time()
+        ttl = self.ttl if max_age is None else min(self.ttl, max_age)
+        with self._lock:
+            if key in self._memory:
+                stored, value = self._memory[key]
+                if now - stored <= ttl:
+                    self._memory.move_to_end(key)
+                    return 'memory', value
+                del self._memory[key]
+
+        if self.path:
+            with self._connect() as conn:
+                row = conn.execute("SELECT stored, value FROM cache WHERE key = ?", (key,)).fetchone()
+            if row and now - row[0] <= ttl:
+                value = pickle.loads(row[1])
+                self._remember(key, row[0], value)
+                return 'disk', value
+
+        return None, None
+
+    def _remember(self, key, stored, value):
+        with self._lock:
+            self._memory[key] = (stored, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _put(self, key, value):
+        stored = time.time()
+        self._remember(key, stored, value)
+        if self.path:
+            with self._connect() as conn:
+                conn.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?)",
+                             (key, stored, pickle.dumps(value)))
+
+    def get_or_fetch(self, key, fetch, kind='data', max_age=None):
+        """
+        Retourne la valeur en cache pour key, ou l'obtient via fetch() une seule fois.
+        max_age (secondes) : âge maximal accepté pour cet appel, s'il est plus court que le TTL du cache.
+        """
+        source, value = self._get(key, max_age)
+        if source is None:
+            key_lock = self._key_locks[hash(key) % len(self._key_locks)]
+            with key_lock:
+                source, value = self._get(key, max_age)
+                if source is None:
+                    start = time.perf_counter()
+                    value = fetch()
+                    metrics.observe('market_data_fetch_seconds', time.perf_counter() - start, kind=kind)
+                    if not _is_empty(value):
+                        self._put(key, value)
+                    source = 'miss'
+
+        metrics.inc('market_data_requests', kind=kind, cache=source)
+        return _detached(value)
+
+    def clear(self):
+        """Vide le cache mémoire et le cache disque."""
+        with self._lock:
+            self._memory.clear()
+        if self.path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM cache")
+
+
+def _default_provider():
+    """Fichiers locaux si PRICING_MARKET_DATA_DIR est défini, yFinance sinon."""
+    local_dir = os.environ.get('PRICING_MARKET_DATA_DIR')
+    return LocalFileProvider(local_dir) if local_dir else YFinanceProvider()
+
+_provider = _default_provider()
+_cache = None
+
+def set_provider(provider):
+    """Remplace le fournisseur de données (ex : LocalFileProvider dans les tests)."""
+    global _provider
+    _provider = provider
+
+def get_provider():
+    return _provider
+
+def configure_cache(path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, memory_size=DEFAULT_MEMORY_SIZE):
+    """Reconfigure le cache partagé (path=None : cache mémoire uniquement)."""
+    global _cache
+    _cache = MarketDataCache(path, ttl, memory_size)
+    return _cache
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = MarketDataCache()
+    return _cache
+
+def _key(*parts):
+    # La date du jour fait partie de la clé : un historique n'est jamais réutilisé d'un jour à l'autre
+    return '|'.join([type(_provider).__name__, date.today().isoformat(), *map(str, parts)])
+
+def get_history(ticker, period='1y', start=None, max_age=None):
+    """
+    Historique de cotations (OHLCV) d'un actif, via le cache ; start (AAAA-MM-JJ) : à partir de cette date.
+    max_age (secondes) : âge maximal accepté d'une entrée en cache (TTL du cache par défaut), pour les autres fonctions aussi.
+    """
+    if start is not None:
+        return get_cache().get_or_fetch(_key('history', ticker, 'start', start),
+                                        lambda: _provider.history(ticker, period, start=start), 'history', max_age)
+    return get_cache().get_or_fetch(_key('history', ticker, period),
+                                    lambda: _provider.history(ticker, period), 'history', max_age)
+
+def get_expirations(ticker, max_age=None):
+    """Dates d'échéance des options cotées sur un actif, via le cache."""
+    return get_cache().get_or_fetch(_key('expirations', ticker),
+                                    lambda: _provider.expirations(ticker), 'expirations', max_age)
+
+def get_option_chain(ticker, expiry, max_age=None):
+    """Chaîne d'options (calls, puts) pour une échéance, via le cache."""
+    return get_cache().get_or_fetch(_key('chain', ticker, expiry),
+                                    lambda: _provider.option_chain(ticker, expiry), 'chain', max_age)
+
+def get_last_close(ticker, period='1d', max_age=None):
+    """Dernier cours de clôture d'un actif, ou None si indisponible."""
+    hist = get_history(ticker, period, max_age=max_age)
+    return None if hist.empty else hist['Close'].iloc[-1]
+
+def get_risk_free_rate(max_age=None):
+    """Taux 10Y américain (^TNX, coté en pourcentage) en décimal, ou DEFAULT_RISK_FREE_RATE si indisponible."""
+    tnx = get_last_close("^TNX", max_age=max_age)
+    return DEFAULT_RISK_FREE_RATE if tnx is None else tnx / 100
+
+def export_to_local(ticker, root, period='1y', expirations=None):
+    """
+    Enregistre les données du fournisseur courant au format de LocalFileProvider.
+    Permet de rejouer une session hors ligne.
+    """
+    folder = os.path.join(root, ticker.upper())
+    os.makedirs(folder, exist_ok=True)
+    get_history(ticker, period).to_csv(os.path.join(folder, f'history_{period}.csv'))
+    for expiry in (get_expirations(ticker) if expirations is None else expirations):
+        calls, puts = get_option_chain(ticker, expiry)
+        calls.to_csv(os.path.join(folder, f'calls_{expiry}.csv'), index=False)
+        puts.to_csv(os.path.join(folder, f'puts_{expiry}.csv'), index=False)
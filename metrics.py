@@ -0,0 +1,162 @@
+"""
+metrics.py
+----------
+Instrumentation optionnelle des modules de pricing (compteurs, jauges et histogrammes).
+
+Fonctionnalités :
+- Activation à la demande (enable() ou variable d'environnement PRICING_METRICS=1), coût quasi nul sinon
+- Compteurs (échecs du solveur, hits/misses du cache de données...), jauges et histogrammes (itérations, durées...)
+- Décorateur timed pour les histogrammes de durée par fonction
+- Export instantané en JSON ou au format texte Prometheus
+"""
+
+import json
+import os
+import threading
+import time
+from functools import wraps
+
+ENABLED = os.environ.get('PRICING_METRICS', '') not in ('', '0')
+PREFIX = 'pricing_'
+TIME_BUCKETS = (1e-5, 1e-4, 1e-3, 1e-2, 0.1, 1.0, 10.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 20, 50, 100)
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_gauges = {}
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+def reset():
+    """Remet toutes les mesures à zéro."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _gauges.clear()
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def inc(name, value=1, **labels):
+    """Incrémente un compteur (sans effet si l'instrumentation est désactivée)."""
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def _histogram(key, buckets):
+    hist = _histograms.get(key)
+    if hist is None:
+        hist = _histograms[key] = {'buckets': tuple(buckets), 'counts': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+    return hist
+
+def observe(name, value, buckets=TIME_BUCKETS, **labels):
+    """Ajoute une observation à un histogramme (sans effet si l'instrumentation est désactivée)."""
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        hist = _histogram(key, buckets)
+        for i, bound in enumerate(hist['buckets']):
+            if value <= bound:
+                hist['counts'][i] += 1
+        hist['sum'] += value
+        hist['count'] += 1
+
+def observe_many(name, values, buckets=COUNT_BUCKETS, **labels):
+    """Ajoute un tableau d'observations d'un coup (ex : itérations d'un solveur vectorisé)."""
+    if not ENABLED:
+        return
+    import numpy as np
+    values = np.asarray(values, dtype=float).ravel()
+    key = _key(name, labels)
+    with _lock:
+        hist = _histogram(key, buckets)
+        for i, bound in enumerate(hist['buckets']):
+            hist['counts'][i] += int(np.count_nonzero(values <= bound))
+        hist['sum'] += float(values.sum())
+        hist['count'] += values.size
+
+def set_gauge(name, value, **labels):
+    """Fixe la dernière valeur d'une jauge (ex : trajectoires/s de la dernière simulation)."""
+    if not ENABLED:
+        return
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+def timed(name=None):
+    """Décorateur : histogramme de durée d'exécution de la fonction (en secondes)."""
+    def decorator(fn):
+        metric = name or f'{fn.__module__}.{fn.__name__}'
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe('function_seconds', time.perf_counter() - start, function=metric)
+        return wrapper
+    return decorator
+
+def snapshot():
+    """État courant des mesures sous forme de dict sérialisable."""
+    with _lock:
+        return {
+            'counters': [{'name': n, 'labels': dict(l), 'value': v} for (n, l), v in _counters.items()],
+            'gauges': [{'name': n, 'labels': dict(l), 'value': v} for (n, l), v in _gauges.items()],
+            'histograms': [{'name': n, 'labels': dict(l), 'buckets': list(h['buckets']),
+                            'counts': list(h['counts']), 'sum': h['sum'], 'count': h['count']}
+                           for (n, l), h in _histograms.items()],
+        }
+
+def to_json():
+    return json.dumps(snapshot(), indent=2)
+
+def _escape_label(value):
+    """Valeur de label échappée selon le format texte Prometheus (\\, \" et saut de ligne)."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels_text(labels, extra=None):
+    items = list(labels.items()) + (list(extra.items()) if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape_label(v)}"' for k, v in items) + '}'
+
+def to_prometheus():
+    """Export au format texte Prometheus."""
+    snap = snapshot()
+    lines, typed = [], set()
+    for c in sorted(snap['counters'], key=lambda c: c['name']):
+        name = PREFIX + c['name'] + '_total'
+        if name not in typed:
+            lines.append(f'# TYPE {name} counter')
+            typed.add(name)
+        lines.append(f"{name}{_labels_text(c['labels'])} {c['value']}")
+    for g in sorted(snap['gauges'], key=lambda g: g['name']):
+        name = PREFIX + g['name']
+        if name not in typed:
+            lines.append(f'# TYPE {name} gauge')
+            typed.add(name)
+        lines.append(f"{name}{_labels_text(g['labels'])} {g['value']}")
+    for h in sorted(snap['histograms'], key=lambda h: h['name']):
+        name = PREFIX + h['name']
+        if name not in typed:
+            lines.append(f'# TYPE {name} histogram')
+            typed.add(name)
+        for bound, count in zip(h['buckets'], h['counts']):
+            lines.append(f"{name}_bucket{_labels_text(h['labels'], {'le': bound})} {count}")
+        lines.append(f"{name}_bucket{_labels_text(h['labels'], {'le': '+Inf'})} {h['count']}")
+        lines.append(f"{name}_sum{_labels_text(h['labels'])} {h['sum']}")
+        lines.append(f"{name}_count{_labels_text(h['labels'])} {h['count']}")
+    return '\n'.join(lines) + '\n'
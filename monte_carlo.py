@@ -4,23 +4,38 @@ monte_carlo.py
 Simulation de trajectoires et pricing d’options européennes par la méthode de Monte Carlo.
 
 Fonctionnalités :
-- Simulation de trajectoires selon un mouvement brownien géométrique
+- Simulation de trajectoires selon un mouvement brownien géométrique (en mémoire ou écrites sur disque, voir path_store)
 - Estimation du prix d’un call européen par Monte Carlo
+- Pricing européen en mémoire bornée (tirage exact de S_T, statistiques cumulées par blocs)
+- Réduction de variance : antithétiques, variable de contrôle, moment matching, Sobol + pont brownien
+- Monte Carlo parallèle (threads ou processus) reproductible via des sous-flux SeedSequence
+- Greeks Monte Carlo en une passe (pathwise, rapport de vraisemblance, nombres aléatoires communs) avec erreurs standard
 - Comparaison au prix théorique de Black-Scholes
-- Affichage des trajectoires simulées (graphique sauvegardé en PNG)
-- Analyse de convergence du modèle en fonction du nombre de simulations
-- Récupération des données de marché (spot, volatilité, taux sans risque) via yFinance
+- Affichage des trajectoires simulées (une seule LineCollection décimée, graphique sauvegardé en PNG)
+- Analyse de convergence du modèle en fonction du nombre de simulations (un seul flux de simulations)
+- Récupération des données de marché (spot, volatilité, taux sans risque) via la couche market_data (yFinance en cache)
 """
 
+import time
+
 import numpy as np
-import matplotlib.pyplot as plt
-import yfinance as yf
+import metrics
 from black_scholes import black_scholes_price
+from market_data import get_history, get_risk_free_rate
 
-def simulate_paths(S0, r, vol, T, n_steps=252, n_simulations=10000):
-    """Simule des trajectoires selon un mouvement brownien géométrique."""
+def simulate_paths(S0, r, vol, T, n_steps=252, n_simulations=10000, store=None, seed=None, **store_options):
+    """
+    Simule des trajectoires selon un mouvement brownien géométrique.
+    seed : graine d'un générateur dédié (tirage reproductible) ; par défaut, générateur global de NumPy.
+    store : chemin d'un fichier .npy ; les trajectoires y sont alors écrites par blocs (mapping mémoire)
+    et un path_store.PathStore est retourné à la place de la matrice (options : chunk_size, dtype).
+    """
+    if store is not None:
+        from path_store import write_paths
+        return write_paths(store, S0, r, vol, T, n_steps, n_simulations, seed=seed, **store_options)
     dt = T / n_steps
-    Z = np.random.standard_normal((n_simulations, n_steps))
+    rng = np.random.default_rng(seed) if seed is not None else np.random
+    Z = rng.standard_normal((n_simulations, n_steps))
     paths = np.zeros((n_simulations, n_steps + 1))
     paths[:, 0] = S0
 
@@ -34,14 +49,11 @@ def monte_carlo_call_price(S0, K, r, vol, T, n_simulations=10000, n_steps=252, p
     paths = simulate_paths(S0, r, vol, T, n_steps, n_simulations)
 
     if plot_paths:
-        plt.figure(figsize=(10, 5))
-        for i in range(min(100, n_simulations)):
-            plt.plot(paths[i], lw=0.5, alpha=0.6)
-        plt.title("Trajectoires simulées de l'actif sous-jacent")
-        plt.xlabel("Pas de temps")
-        plt.ylabel("Prix")
-        plt.grid(True)
-        plt.tight_layout()
+        import matplotlib.pyplot as plt
+
+        fig, ax = plt.subplots(figsize=(10, 5))
+        draw_paths(ax, paths)
+        fig.tight_layout()
         plt.savefig("monte_carlo_paths.png")
         plt.show()
         print("Graphique sauvegardé sous : monte_carlo_paths.png")
@@ -50,33 +62,453 @@ def monte_carlo_call_price(S0, K, r, vol, T, n_simulations=10000, n_steps=252, p
     discounted = np.exp(-r * T) * payoff
     return round(discounted.mean(), 4), round(discounted.std(), 4)
 
-def convergence_analysis(S0, K, r, vol, T, n_steps=252, max_sim=10000):
-    """Analyse la convergence du prix Monte Carlo vers Black-Scholes."""
-    from tqdm import tqdm
-    sim_counts = np.linspace(500, max_sim, 30, dtype=int)
-    prices = []
+def _decimated_columns(n_columns, max_points):
+    """Indices d'au plus ~max_points colonnes régulièrement espacées (la dernière toujours incluse)."""
+    stride = max(1, int(np.ceil(n_columns / max_points)))
+    return np.unique(np.r_[np.arange(0, n_columns, stride), n_columns - 1])
+
+def draw_paths(ax, paths, max_paths=100, max_points=500):
+    """
+    Trace un échantillon de trajectoires en une seule LineCollection (au lieu d'un plt.plot par trajectoire).
+    paths : matrice (n_simulations, n_steps + 1) ou path_store.PathStore ; les max_paths premières
+    trajectoires sont tracées, décimées à max_points pas de temps au plus.
+    """
+    from matplotlib import colormaps
+    from matplotlib.collections import LineCollection
+
+    paths = getattr(paths, 'paths', paths)  # PathStore : matrice mappée en mémoire
+    steps = _decimated_columns(paths.shape[1], max_points)
+    sample = np.asarray(paths[:max_paths], dtype=float)[:, steps]
+    segments = np.stack([np.broadcast_to(steps, sample.shape), sample], axis=-1)
+    colors = colormaps['tab10'](np.arange(len(sample)) % 10)
+
+    ax.add_collection(LineCollection(segments, colors=colors, linewidths=0.5, alpha=0.6))
+    ax.autoscale_view()
+    ax.set_title("Trajectoires simulées de l'actif sous-jacent")
+    ax.set_xlabel("Pas de temps")
+    ax.set_ylabel("Prix")
+    ax.grid(True)
+    return ax
+
+def _chunk_stats(values):
+    """Statistiques (n, moyenne, M2) d'un bloc d'échantillons."""
+    mean = values.mean()
+    return values.size, mean, np.sum((values - mean) ** 2)
+
+def _merge_stats(a, b):
+    """Fusionne deux statistiques (n, moyenne, M2) — formule de Welford/Chan, exacte par bloc."""
+    n_a, mean_a, m2_a = a
+    n_b, mean_b, m2_b = b
+    n = n_a + n_b
+    if n == 0:
+        return a
+    delta = mean_b - mean_a
+    mean = mean_a + delta * n_b / n
+    m2 = m2_a + m2_b + delta**2 * n_a * n_b / n
+    return n, mean, m2
+
+def _summarize_stats(stats, confidence=0.95):
+    """Prix, erreur standard et intervalle de confiance à partir de (n, moyenne, M2)."""
+    n, mean, m2 = stats
+    std = np.sqrt(m2 / (n - 1)) if n > 1 else 0.0
+    std_error = std / np.sqrt(n)
+    from scipy.special import ndtri
+    z = ndtri(0.5 + confidence / 2)
+    return {
+        'price': float(mean),
+        'std_error': float(std_error),
+        'conf_int': (float(mean - z * std_error), float(mean + z * std_error)),
+        'n_simulations': int(n),
+    }
+
+def _record_run(engine, result, start):
+    """Mesures d'une simulation (trajectoires/s, erreur standard) si l'instrumentation est active."""
+    if not metrics.ENABLED:
+        return
+    elapsed = time.perf_counter() - start
+    metrics.inc('mc_paths', result['n_simulations'], engine=engine)
+    metrics.observe('mc_seconds', elapsed, engine=engine)
+    metrics.set_gauge('mc_paths_per_second', result['n_simulations'] / elapsed if elapsed > 0 else float('inf'),
+                      engine=engine)
+    metrics.set_gauge('mc_std_error', result['std_error'], engine=engine)
+
+def european_payoff(S_T, K, option_type='call'):
+    """Payoff d'une option européenne vanille à partir des prix terminaux."""
+    if option_type == 'call':
+        return np.maximum(S_T - K, 0)
+    elif option_type == 'put':
+        return np.maximum(K - S_T, 0)
+    raise ValueError("option_type doit être 'call' ou 'put'.")
+
+def simulate_terminal(S0, r, vol, T, n_simulations, rng):
+    """Tire exactement S_T d'un mouvement brownien géométrique (aucune trajectoire intermédiaire)."""
+    Z = rng.standard_normal(n_simulations)
+    return S0 * np.exp((r - 0.5 * vol**2) * T + vol * np.sqrt(T) * Z)
+
+def _block_sizes(n_simulations, chunk_size):
+    """Découpe le budget de trajectoires en blocs de taille fixe (indépendante du nombre de workers)."""
+    n_full, rest = divmod(n_simulations, chunk_size)
+    return [chunk_size] * n_full + ([rest] if rest else [])
+
+def _european_block_stats(n, seed_seq, S0, K, r, vol, T, option_type='call', payoff=None):
+    """Statistiques (n, moyenne, M2) d'un bloc de payoffs actualisés, tiré sur son propre flux aléatoire."""
+    rng = np.random.default_rng(seed_seq)
+    S_T = simulate_terminal(S0, r, vol, T, n, rng)
+    values = np.exp(-r * T) * (payoff(S_T) if payoff is not None else european_payoff(S_T, K, option_type))
+    return _chunk_stats(values)
+
+def monte_carlo_european_price(S0, K, r, vol, T, n_simulations=1_000_000, option_type='call',
+                               payoff=None, chunk_size=100_000, confidence=0.95, seed=None):
+    """
+    Prix Monte Carlo d'une option européenne en mémoire bornée.
+
+    S_T est tiré exactement (pas de discrétisation), par blocs de chunk_size trajectoires ;
+    moyenne et variance sont cumulées bloc par bloc, la mémoire ne dépend donc pas de n_simulations.
+    Chaque bloc a son propre flux SeedSequence.spawn : le résultat est identique à celui de
+    parallel_monte_carlo_european_price pour la même graine et le même chunk_size.
+    payoff : fonction optionnelle S_T -> payoff (sinon call/put vanille de strike K).
+    Retourne un dict : price, std_error, conf_int, n_simulations.
+    """
+    start = time.perf_counter()
+    sizes = _block_sizes(n_simulations, chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    stats = (0, 0.0, 0.0)
+
+    for n, seed_seq in zip(sizes, seeds):
+        stats = _merge_stats(stats, _european_block_stats(n, seed_seq, S0, K, r, vol, T, option_type, payoff))
+
+    result = _summarize_stats(stats, confidence)
+    _record_run('streaming', result, start)
+    return result
+
+def parallel_monte_carlo_european_price(S0, K, r, vol, T, n_simulations=10_000_000, option_type='call',
+                                        payoff=None, chunk_size=100_000, n_workers=None,
+                                        use_processes=False, confidence=0.95, seed=None):
+    """
+    Prix Monte Carlo européen réparti sur plusieurs cœurs.
+
+    Le budget est découpé en blocs de chunk_size trajectoires, chacun avec un flux indépendant issu
+    de SeedSequence(seed).spawn ; les statistiques partielles sont fusionnées dans l'ordre des blocs.
+    Une même graine donne donc un résultat identique au bit près quel que soit n_workers.
+    Par défaut un pool de threads (NumPy libère le GIL dans ses générateurs et ufuncs) ;
+    use_processes=True utilise un pool de processus (payoff doit alors être picklable).
+    """
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+    from functools import partial
+
+    start = time.perf_counter()
+    sizes = _block_sizes(n_simulations, chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    block = partial(_european_block_stats, S0=S0, K=K, r=r, vol=vol, T=T,
+                    option_type=option_type, payoff=payoff)
+
+    executor_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with executor_cls(max_workers=n_workers) as executor:
+        partials = list(executor.map(block, sizes, seeds))
+
+    stats = (0, 0.0, 0.0)
+    for part in partials:
+        stats = _merge_stats(stats, part)
+    result = _summarize_stats(stats, confidence)
+    _record_run('parallel', result, start)
+    return result
+
+GREEK_METHODS = ('pathwise', 'likelihood_ratio', 'crn')
+CRN_BUMPS = {'spot': 0.01, 'vol': 1e-3, 'rate': 1e-4}  # choc relatif sur S0, chocs absolus sur vol et r
+
+def _greek_block_estimators(n, seed_seq, S0, K, r, vol, T, option_type='call', payoff=None, method='pathwise'):
+    """
+    Estimateurs par trajectoire (prix actualisé, delta, gamma, vega, rho) d'un bloc, tirés sur son propre flux.
+
+    - pathwise : dérivée du payoff vanille le long de la trajectoire (delta, vega, rho) ;
+      gamma par l'estimateur mixte vraisemblance/pathwise (la dérivée seconde du payoff est une masse de Dirac)
+    - likelihood_ratio : payoff actualisé multiplié par la fonction score de la loi de S_T (tout payoff)
+    - crn : différences finies centrées réévaluées sur les mêmes tirages Z (nombres aléatoires communs)
+    """
+    rng = np.random.default_rng(seed_seq)
+    Z = rng.standard_normal(n)
+    sqrt_T = np.sqrt(T)
+    S_T = S0 * np.exp((r - 0.5 * vol**2) * T + vol * sqrt_T * Z)
+    discount = np.exp(-r * T)
+
+    def value(S, rate=r):
+        return np.exp(-rate * T) * (payoff(S) if payoff is not None else european_payoff(S, K, option_type))
+
+    price = value(S_T)
+
+    if method == 'pathwise':
+        sign = 1.0 if option_type == 'call' else -1.0
+        slope = discount * sign * ((S_T > K) if option_type == 'call' else (S_T < K)) * S_T  # e^{-rT} f'(S_T) S_T
+        delta = slope / S0
+        gamma = slope / S0**2 * (Z / (vol * sqrt_T) - 1)
+        vega = slope * (sqrt_T * Z - vol * T)
+        rho = T * (slope - price)
+    elif method == 'likelihood_ratio':
+        score_S = Z / (S0 * vol * sqrt_T)
+        delta = price * score_S
+        gamma = price * (score_S**2 - score_S / S0 - 1 / (S0**2 * vol**2 * T))
+        vega = price * ((Z**2 - 1) / vol - sqrt_T * Z)
+        rho = price * (sqrt_T * Z / vol - T)
+    else:
+        h, dv, dr = CRN_BUMPS['spot'], CRN_BUMPS['vol'], CRN_BUMPS['rate']
+        up, down = value(S_T * (1 + h)), value(S_T * (1 - h))
+        delta = (up - down) / (2 * h * S0)
+        gamma = (up - 2 * price + down) / (h * S0)**2
+        vega = (value(S_T * np.exp(-vol * dv * T - 0.5 * dv**2 * T + dv * sqrt_T * Z))
+                - value(S_T * np.exp(vol * dv * T - 0.5 * dv**2 * T - dv * sqrt_T * Z))) / (2 * dv)
+        rho = (value(S_T * np.exp(dr * T), r + dr) - value(S_T * np.exp(-dr * T), r - dr)) / (2 * dr)
+
+    # Mêmes unités que black_scholes_greeks : vega et rho pour 1 % de variation
+    estimators = {'price': price, 'delta': delta, 'gamma': gamma, 'vega': vega / 100, 'rho': rho / 100}
+    return {name: _chunk_stats(values) for name, values in estimators.items()}
+
+def monte_carlo_greeks(S0, K, r, vol, T, n_simulations=1_000_000, option_type='call', payoff=None,
+                       method='pathwise', chunk_size=100_000, confidence=0.95, seed=None):
+    """
+    Prix et Greeks (delta, gamma, vega, rho) Monte Carlo en une seule passe sur les mêmes trajectoires.
 
-    for n in tqdm(sim_counts, desc="Analyse de convergence"):
-        price, _ = monte_carlo_call_price(S0, K, r, vol, T, n_simulations=n, n_steps=n_steps, plot_paths=False)
-        prices.append(price)
+    Chaque Greek est la moyenne d'un estimateur par trajectoire (voir _greek_block_estimators) :
+    son erreur standard et son intervalle de confiance sont cumulés bloc par bloc comme le prix.
+    method : 'pathwise' (vanille uniquement, variance la plus faible), 'likelihood_ratio'
+    (tout payoff fonction de S_T) ou 'crn' (chocs sur les mêmes tirages, tout payoff).
+    Vega et rho sont exprimés pour 1 % de variation, comme dans black_scholes_greeks.
+    Retourne un dict : price, delta, gamma, vega, rho (chacun {value, std_error, conf_int}), n_simulations, method.
+    """
+    if method not in GREEK_METHODS:
+        raise ValueError(f"method doit être parmi {GREEK_METHODS}.")
+    if method == 'pathwise' and payoff is not None:
+        raise ValueError("L'estimateur pathwise exige le payoff vanille ; utiliser 'likelihood_ratio' ou 'crn'.")
+    if payoff is None:
+        european_payoff(np.float64(S0), K, option_type)  # valide option_type
 
+    start = time.perf_counter()
+    sizes = _block_sizes(n_simulations, chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    stats = {}
+
+    for n, seed_seq in zip(sizes, seeds):
+        block = _greek_block_estimators(n, seed_seq, S0, K, r, vol, T, option_type, payoff, method)
+        stats = {name: _merge_stats(stats.get(name, (0, 0.0, 0.0)), part) for name, part in block.items()}
+
+    result = {}
+    for name, greek_stats in stats.items():
+        summary = _summarize_stats(greek_stats, confidence)
+        result[name] = {'value': summary['price'], 'std_error': summary['std_error'], 'conf_int': summary['conf_int']}
+    result['n_simulations'] = int(n_simulations)
+    result['method'] = method
+    _record_run('greeks', {'n_simulations': int(n_simulations), 'std_error': result['price']['std_error']}, start)
+    return result
+
+VARIANCE_REDUCTION_METHODS = ('antithetic', 'control_variate', 'moment_matching', 'sobol')
+SOBOL_REPLICATES = 16  # brouillages indépendants pour estimer l'erreur standard en quasi-Monte Carlo
+MOMENT_MATCHING_REPLICATES = 16  # lots appariés indépendamment (tirages appariés non indépendants entre eux)
+
+def brownian_bridge(Z, T):
+    """
+    Construit des trajectoires browniennes W(t_1..t_n) par pont brownien.
+
+    La colonne 0 de Z fixe W(T), les suivantes remplissent les milieux par bissection : les
+    premières dimensions (les mieux réparties en Sobol) portent la structure grossière des trajectoires.
+    """
+    n_paths, n_steps = Z.shape
+    dt = T / n_steps
+    W = np.zeros((n_paths, n_steps + 1))
+    W[:, n_steps] = np.sqrt(T) * Z[:, 0]
+
+    k = 1
+    intervals = [(0, n_steps)]
+    while intervals:
+        left, right = intervals.pop(0)
+        if right - left < 2:
+            continue
+        mid = (left + right) // 2
+        t_l, t_m, t_r = left * dt, mid * dt, right * dt
+        W[:, mid] = ((t_r - t_m) * W[:, left] + (t_m - t_l) * W[:, right]) / (t_r - t_l) \
+            + np.sqrt((t_m - t_l) * (t_r - t_m) / (t_r - t_l)) * Z[:, k]
+        k += 1
+        intervals += [(left, mid), (mid, right)]
+
+    return W[:, 1:]
+
+def sobol_normals(n_paths, n_dims, seed=None):
+    """Normales quasi-aléatoires (Sobol brouillé), n_paths arrondi à la puissance de 2 supérieure."""
+    from scipy.special import ndtri
+    from scipy.stats import qmc
+    m = int(np.ceil(np.log2(max(n_paths, 2))))
+    U = qmc.Sobol(d=n_dims, scramble=True, seed=seed).random_base2(m)
+    return ndtri(U)
+
+def _terminal_from_brownian(S0, r, vol, T, W_T):
+    """Prix terminal d'un mouvement brownien géométrique à partir de W(T)."""
+    return S0 * np.exp((r - 0.5 * vol**2) * T + vol * W_T)
+
+def monte_carlo_call_price_vr(S0, K, r, vol, T, n_simulations=10000, n_steps=1, methods=('antithetic',),
+                              option_type='call', confidence=0.95, seed=None):
+    """
+    Prix Monte Carlo d'une option européenne avec réduction de variance.
+
+    methods : combinaison de 'antithetic', 'control_variate' (spot terminal actualisé, d'espérance S0),
+    'moment_matching' (normales recentrées et réduites par pas de temps, dans chacun de
+    MOMENT_MATCHING_REPLICATES lots indépendants) et 'sobol' (quasi-Monte Carlo brouillé + pont brownien
+    si n_steps > 1 ; combinable avec 'control_variate'). Avec 'sobol' ou 'moment_matching', l'erreur
+    standard est estimée sur les moyennes des répliques indépendantes.
+    Retourne un dict : price, std_error, conf_int, n_simulations et variance_reduction_factor
+    (variance de l'estimateur naïf sur les mêmes tirages bruts / variance obtenue, à nombre de trajectoires égal).
+    """
+    methods = set(methods)
+    unknown = methods - set(VARIANCE_REDUCTION_METHODS)
+    if unknown:
+        raise ValueError(f"Méthodes inconnues : {sorted(unknown)}. Choix : {VARIANCE_REDUCTION_METHODS}")
+    if 'sobol' in methods and methods & {'antithetic', 'moment_matching'}:
+        raise ValueError("'sobol' ne se combine qu'avec 'control_variate'.")
+
+    start = time.perf_counter()
+    discount = np.exp(-r * T)
+    if 'sobol' in methods:
+        seeds = np.random.SeedSequence(seed).spawn(SOBOL_REPLICATES)
+        n_per = max(n_simulations // SOBOL_REPLICATES, 2)
+        W_T = np.stack([brownian_bridge(sobol_normals(n_per, n_steps, np.random.default_rng(s)), T)[:, -1]
+                        for s in seeds])
+        plain_W_T = W_T
+    else:
+        rng = np.random.default_rng(seed)
+        # Moment matching : un lot indépendant par réplique (axe 0), apparié sur ses propres tirages
+        replicates = MOMENT_MATCHING_REPLICATES if 'moment_matching' in methods else 1
+        n_per = max(n_simulations // replicates, 2) if replicates > 1 else n_simulations
+        n_draws = (n_per + 1) // 2 if 'antithetic' in methods else n_per
+        Z = rng.standard_normal((replicates, n_draws, n_steps))
+        if 'antithetic' in methods:
+            Z = np.concatenate([Z, -Z], axis=1)
+        plain_W_T = np.sqrt(T / n_steps) * Z.sum(axis=2)
+        if 'moment_matching' in methods:
+            Z = (Z - Z.mean(axis=1, keepdims=True)) / Z.std(axis=1, keepdims=True)
+            W_T = np.sqrt(T / n_steps) * Z.sum(axis=2)
+        else:
+            plain_W_T = W_T = plain_W_T[0]
+
+    S_T = _terminal_from_brownian(S0, r, vol, T, W_T)
+    X = discount * european_payoff(S_T, K, option_type)
+    # Variance de l'estimateur naïf, sur les tirages bruts (avant appariement des moments)
+    plain_X = X if plain_W_T is W_T else discount * european_payoff(
+        _terminal_from_brownian(S0, r, vol, T, plain_W_T), K, option_type)
+    plain_variance = plain_X.var(ddof=1) / plain_X.size
+
+    if 'control_variate' in methods:
+        Y = discount * S_T
+        Y_centered = Y - Y.mean()
+        beta = np.sum((X - X.mean()) * Y_centered) / np.sum(Y_centered**2)
+        X = X - beta * (Y - S0)
+
+    if methods & {'sobol', 'moment_matching'}:
+        # Un échantillon indépendant par brouillage ou par lot apparié : la moyenne de chaque réplique
+        samples = X.mean(axis=1)
+    elif 'antithetic' in methods:
+        half = X.size // 2
+        samples = 0.5 * (X[:half] + X[half:])
+    else:
+        samples = X
+
+    stats = _chunk_stats(np.ravel(samples))
+    result = _summarize_stats(stats, confidence)
+    result['n_simulations'] = int(X.size)
+    result['variance_reduction_factor'] = float(plain_variance / result['std_error']**2) \
+        if result['std_error'] > 0 else float('inf')
+    _record_run('variance_reduction', result, start)
+    return result
+
+def convergence_profile(S0, K, r, vol, T, checkpoints=None, max_sim=10000, option_type='call',
+                        chunk_size=100_000, target_error=None, confidence=0.95, seed=None):
+    """
+    Profil de convergence Monte Carlo calculé sur un seul flux de simulations.
+
+    Les trajectoires sont tirées une seule fois par blocs (mêmes flux que monte_carlo_european_price) ;
+    l'estimation, l'erreur standard et l'intervalle de confiance à chaque point de contrôle
+    sont obtenus à partir des statistiques du préfixe. Si target_error est fourni, la simulation
+    s'arrête au premier point où l'écart au prix Black-Scholes et la demi-largeur de l'intervalle
+    de confiance sont tous deux inférieurs à target_error. Les points de contrôle (>= 1) fixent max_sim
+    s'ils sont fournis ; sinon, 30 points répartis jusqu'à max_sim.
+    Retourne un DataFrame : n_simulations, price, std_error, ci_low, ci_high, abs_error.
+    """
+    import pandas as pd
+
+    if checkpoints is None:
+        if max_sim < 1:
+            raise ValueError("max_sim doit être >= 1.")
+        checkpoints = np.linspace(min(500, max_sim), max_sim, 30, dtype=int)
+    checkpoints = np.unique(np.asarray(checkpoints, dtype=int))
+    if checkpoints.size == 0 or checkpoints[0] < 1:
+        raise ValueError("Les points de contrôle doivent être des nombres de simulations >= 1.")
+    max_sim = int(checkpoints[-1])
+    bs_price = black_scholes_price(S0, K, T, r, vol, option_type)
+
+    sizes = _block_sizes(max_sim, chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    discount = np.exp(-r * T)
+    stats = (0, 0.0, 0.0)
+    rows = []
+    next_cp = 0
+
+    for n, seed_seq in zip(sizes, seeds):
+        S_T = simulate_terminal(S0, r, vol, T, n, np.random.default_rng(seed_seq))
+        values = discount * european_payoff(S_T, K, option_type)
+
+        # Points de contrôle tombant dans ce bloc : statistiques du préfixe correspondant
+        while next_cp < checkpoints.size and checkpoints[next_cp] <= stats[0] + n:
+            prefix = _merge_stats(stats, _chunk_stats(values[:checkpoints[next_cp] - stats[0]]))
+            summary = _summarize_stats(prefix, confidence)
+            half_width = summary['conf_int'][1] - summary['price']
+            rows.append({
+                'n_simulations': summary['n_simulations'],
+                'price': summary['price'],
+                'std_error': summary['std_error'],
+                'ci_low': summary['conf_int'][0],
+                'ci_high': summary['conf_int'][1],
+                'abs_error': abs(summary['price'] - bs_price),
+            })
+            next_cp += 1
+            if target_error is not None and rows[-1]['abs_error'] <= target_error and half_width <= target_error:
+                return pd.DataFrame(rows)
+
+        stats = _merge_stats(stats, _chunk_stats(values))
+
+    return pd.DataFrame(rows)
+
+def convergence_analysis(S0, K, r, vol, T, n_steps=252, max_sim=10000, seed=None):
+    """
+    Analyse la convergence du prix Monte Carlo vers Black-Scholes.
+
+    Une seule simulation de max_sim trajectoires alimente tous les points de la courbe
+    (S_T étant tiré exactement, n_steps est conservé pour compatibilité mais n'intervient pas).
+    """
+    import matplotlib.pyplot as plt
+
+    profile = convergence_profile(S0, K, r, vol, T, max_sim=max_sim, seed=seed)
     bs_price = black_scholes_price(S0, K, T, r, vol)
 
-    plt.figure(figsize=(10, 5))
-    plt.plot(sim_counts, prices, label='Estimation Monte Carlo')
-    plt.axhline(bs_price, color='red', linestyle='--', label='Black-Scholes (théorique)')
-    plt.xlabel('Nombre de simulations')
-    plt.ylabel('Prix estimé')
-    plt.title('Convergence vers le prix théorique')
-    plt.legend()
-    plt.grid(True)
-    plt.tight_layout()
+    fig, ax = plt.subplots(figsize=(10, 5))
+    draw_convergence(ax, profile, bs_price)
+    fig.tight_layout()
     plt.show()
 
+    return profile
+
+def draw_convergence(ax, profile, bs_price):
+    """Trace un profil de convergence (convergence_profile) face au prix Black-Scholes."""
+    ax.plot(profile['n_simulations'], profile['price'], label='Estimation Monte Carlo')
+    ax.fill_between(profile['n_simulations'], profile['ci_low'], profile['ci_high'],
+                    alpha=0.2, label='Intervalle de confiance à 95 %')
+    ax.axhline(bs_price, color='red', linestyle='--', label='Black-Scholes (théorique)')
+    ax.set_xlabel('Nombre de simulations')
+    ax.set_ylabel('Prix estimé')
+    ax.set_title('Convergence vers le prix théorique')
+    ax.legend()
+    ax.grid(True)
+    return ax
+
 def get_market_data(ticker, period='1y'):
     """Récupère le prix spot, la volatilité et le taux sans risque."""
     try:
-        hist = yf.Ticker(ticker).history(period=period)
+        hist = get_history(ticker, period)
         if hist.empty:
             raise ValueError(f"Aucune donnée pour {ticker}")
 
@@ -84,8 +516,7 @@ def get_market_data(ticker, period='1y'):
         returns = hist['Close'].pct_change().dropna()
         vol = returns.std() * np.sqrt(252)
 
-        tnx = yf.Ticker("^TNX").history(period="1d")
-        r = tnx['Close'].iloc[-1] / 100 if not tnx.empty else 0.044
+        r = get_risk_free_rate()
 
         return S0, vol, r
 
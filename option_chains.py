@@ -0,0 +1,134 @@
+"""
+option_chains.py
+----------------
+Ingestion de chaînes d'options complètes et stockage en instantanés Parquet.
+
+Fonctionnalités :
+- Récupération de toutes les échéances d'un sous-jacent
+- Nettoyage vectorisé des cotations (bid/ask nuls, marchés croisés, cotations anciennes, mid/spread)
+- Ajout de la maturité T et du forward
+- Stockage en instantanés horodatés, partitionnés par ticker et par date (Parquet)
+- Relecture par mapping mémoire, sans nouveau téléchargement
+"""
+
+import glob
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from market_data import get_expirations, get_option_chain, get_last_close, get_risk_free_rate
+
+DEFAULT_SNAPSHOT_DIR = 'option_snapshots'
+QUOTE_COLUMNS = ['contractSymbol', 'strike', 'bid', 'ask', 'lastPrice', 'volume', 'openInterest',
+                 'impliedVolatility', 'lastTradeDate']
+CLEAN_COLUMNS = ['T', 'mid', 'spread', 'rel_spread', 'spot', 'r', 'forward', 'as_of']
+
+def fetch_chain(ticker, max_workers=8, max_age=None):
+    """
+    Chaîne d'options brute pour toutes les échéances, avec les colonnes 'expiry' et 'type'.
+    max_age : âge maximal (s) des cotations reprises du cache market_data (TTL du cache par défaut).
+    """
+    expirations = get_expirations(ticker, max_age)
+
+    def fetch(expiry):
+        calls, puts = get_option_chain(ticker, expiry, max_age)
+        frames = []
+        for option_type, quotes in (('call', calls), ('put', puts)):
+            quotes = quotes[[c for c in QUOTE_COLUMNS if c in quotes.columns]].copy()
+            quotes['expiry'] = expiry
+            quotes['type'] = option_type
+            frames.append(quotes)
+        return pd.concat(frames, ignore_index=True)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        frames = list(executor.map(fetch, expirations))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def clean_chain(chain, spot, r, as_of=None, stale_days=5):
+    """
+    Nettoie une chaîne d'options de façon vectorisée et ajoute mid, spread, T et forward.
+
+    Sont écartées : les cotations à bid ou ask nul, les marchés croisés (bid > ask), les cotations
+    dont la dernière transaction date de plus de stale_days jours et les échéances passées.
+    as_of : instant de référence, en UTC (maintenant par défaut ; un horodatage avec fuseau est converti),
+    comme lastTradeDate. Une chaîne vide donne un DataFrame vide avec les colonnes attendues.
+    """
+    as_of = pd.Timestamp.now(tz='UTC') if as_of is None else pd.Timestamp(as_of)
+    if as_of.tzinfo is not None:
+        as_of = as_of.tz_convert('UTC').tz_localize(None)
+    if chain.empty:
+        columns = list(chain.columns) or QUOTE_COLUMNS + ['expiry', 'type']
+        return pd.DataFrame(columns=columns + [c for c in CLEAN_COLUMNS if c not in columns])
+    chain = chain.copy()
+
+    keep = (chain['bid'] > 0) & (chain['ask'] > 0) & (chain['bid'] <= chain['ask'])
+    if 'lastTradeDate' in chain.columns:
+        last_trade = pd.to_datetime(chain['lastTradeDate'], utc=True).dt.tz_localize(None)
+        keep &= (as_of - last_trade) <= pd.Timedelta(days=stale_days)
+
+    expiry = pd.to_datetime(chain['expiry'])
+    chain['T'] = (expiry - as_of).dt.total_seconds() / (365 * 24 * 3600)
+    keep &= chain['T'] > 0
+
+    chain = chain[keep].reset_index(drop=True)
+    chain['mid'] = (chain['bid'] + chain['ask']) / 2
+    chain['spread'] = chain['ask'] - chain['bid']
+    chain['rel_spread'] = chain['spread'] / chain['mid']
+    chain['spot'] = spot
+    chain['r'] = r
+    chain['forward'] = spot * np.exp(r * chain['T'])
+    chain['as_of'] = as_of
+    return chain
+
+def take_snapshot(ticker, stale_days=5, max_age=None):
+    """
+    Télécharge et nettoie la chaîne complète d'un sous-jacent (un instantané).
+    max_age : âge maximal (s) des données reprises du cache market_data, comme pour fetch_chain.
+    """
+    spot = get_last_close(ticker, max_age=max_age)
+    if spot is None:
+        raise ValueError(f"Aucun prix spot disponible pour {ticker}")
+    r = get_risk_free_rate(max_age)
+
+    snapshot = clean_chain(fetch_chain(ticker, max_age=max_age), spot, r, stale_days=stale_days)
+    if snapshot.empty:
+        raise ValueError(f"Aucune cotation exploitable pour {ticker}")
+    snapshot.insert(0, 'ticker', ticker)
+    return snapshot
+
+def save_snapshot(snapshot, root=DEFAULT_SNAPSHOT_DIR):
+    """
+    Écrit un instantané en Parquet, partitionné par ticker et par date :
+    root/ticker=<TICKER>/date=<AAAA-MM-JJ>/<HHMMSS>.parquet. Retourne le chemin écrit.
+    """
+    ticker = snapshot['ticker'].iloc[0]
+    as_of = pd.Timestamp(snapshot['as_of'].iloc[0])
+    folder = os.path.join(root, f'ticker={ticker}', f'date={as_of.date().isoformat()}')
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f'{as_of.strftime("%H%M%S")}.parquet')
+    snapshot.to_parquet(path, index=False)
+    return path
+
+def ingest(ticker, root=DEFAULT_SNAPSHOT_DIR, stale_days=5):
+    """Prend et enregistre un instantané de la chaîne d'options complète. Retourne le chemin écrit."""
+    return save_snapshot(take_snapshot(ticker, stale_days), root)
+
+def list_snapshots(root=DEFAULT_SNAPSHOT_DIR, ticker='*', date='*'):
+    """Chemins des instantanés enregistrés, triés par ticker puis chronologiquement."""
+    return sorted(glob.glob(os.path.join(root, f'ticker={ticker}', f'date={date}', '*.parquet')))
+
+def load_snapshot(path, columns=None):
+    """Relit un instantané par mapping mémoire (aucun accès réseau)."""
+    import pyarrow.parquet as pq
+    return pq.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+def load_latest_snapshot(ticker, root=DEFAULT_SNAPSHOT_DIR, date='*', columns=None):
+    """Dernier instantané enregistré pour un ticker (éventuellement à une date donnée), ou None."""
+    paths = list_snapshots(root, ticker, date)
+    return load_snapshot(paths[-1], columns) if paths else None
+
+if __name__ == "__main__":
+    ticker = input("Ticker (ex: AAPL, MSFT) : ").upper()
+    path = ingest(ticker)
+    print(f"Instantané enregistré : {path}")
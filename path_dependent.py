@@ -0,0 +1,238 @@
+"""
+path_dependent.py
+-----------------
+Pricing Monte Carlo d'options dépendant de la trajectoire et d'options américaines/bermudéennes.
+
+Fonctionnalités :
+- Moteur pas à pas qui cumule l'état de chaque trajectoire (moyenne, min/max, franchissement de barrière)
+  au lieu de stocker la matrice complète des trajectoires : mémoire O(taille de bloc)
+- Options asiatiques (moyenne arithmétique ou géométrique), à barrière (knock-in / knock-out) et lookback
+- Options américaines/bermudéennes par Longstaff-Schwartz : régression sur des trajectoires générées à
+  rebours (pont brownien), puis valorisation sur des blocs de trajectoires indépendantes
+"""
+
+import numpy as np
+from monte_carlo import _block_sizes, _chunk_stats, _merge_stats, _summarize_stats, european_payoff
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+class AsianPayoff:
+    """Option asiatique sur la moyenne (arithmétique ou géométrique) des prix aux dates d'observation."""
+
+    def __init__(self, K, option_type='call', averaging='arithmetic'):
+        if averaging not in ('arithmetic', 'geometric'):
+            raise ValueError("averaging doit être 'arithmetic' ou 'geometric'.")
+        self.K, self.option_type, self.averaging = K, option_type, averaging
+
+    def start(self, S):
+        return {'sum': np.zeros_like(S), 'steps': 0}
+
+    def update(self, state, S):
+        state['sum'] += S if self.averaging == 'arithmetic' else np.log(S)
+        state['steps'] += 1
+
+    def payoff(self, state, S):
+        mean = state['sum'] / state['steps']
+        average = mean if self.averaging == 'arithmetic' else np.exp(mean)
+        return european_payoff(average, self.K, self.option_type)
+
+
+class BarrierPayoff:
+    """
+    Option à barrière (surveillance discrète aux dates de simulation).
+    barrier_type : 'up-and-out', 'up-and-in', 'down-and-out' ou 'down-and-in'.
+    """
+
+    def __init__(self, K, barrier, barrier_type='up-and-out', option_type='call', rebate=0.0):
+        if barrier_type not in ('up-and-out', 'up-and-in', 'down-and-out', 'down-and-in'):
+            raise ValueError("barrier_type doit être 'up-and-out', 'up-and-in', 'down-and-out' ou 'down-and-in'.")
+        self.K, self.barrier, self.barrier_type = K, barrier, barrier_type
+        self.option_type, self.rebate = option_type, rebate
+
+    def start(self, S):
+        return {'hit': self._crossed(S)}
+
+    def _crossed(self, S):
+        return S >= self.barrier if self.barrier_type.startswith('up') else S <= self.barrier
+
+    def update(self, state, S):
+        state['hit'] |= self._crossed(S)
+
+    def payoff(self, state, S):
+        vanilla = european_payoff(S, self.K, self.option_type)
+        active = ~state['hit'] if self.barrier_type.endswith('out') else state['hit']
+        return np.where(active, vanilla, self.rebate)
+
+
+class LookbackPayoff:
+    """
+    Option lookback : à strike flottant (S_T contre le min/max de la trajectoire)
+    ou à strike fixe (max/min de la trajectoire contre K).
+    """
+
+    def __init__(self, option_type='call', strike_type='floating', K=None):
+        if strike_type not in ('floating', 'fixed'):
+            raise ValueError("strike_type doit être 'floating' ou 'fixed'.")
+        if strike_type == 'fixed' and K is None:
+            raise ValueError("Un strike K est requis pour un lookback à strike fixe.")
+        self.option_type, self.strike_type, self.K = option_type, strike_type, K
+
+    def start(self, S):
+        return {'min': S.copy(), 'max': S.copy()}
+
+    def update(self, state, S):
+        np.minimum(state['min'], S, out=state['min'])
+        np.maximum(state['max'], S, out=state['max'])
+
+    def payoff(self, state, S):
+        if self.strike_type == 'floating':
+            return S - state['min'] if self.option_type == 'call' else state['max'] - S
+        extreme = state['max'] if self.option_type == 'call' else state['min']
+        return european_payoff(extreme, self.K, self.option_type)
+
+
+def path_dependent_price(S0, r, vol, T, payoff, n_steps=252, n_simulations=100_000,
+                         chunk_size=DEFAULT_CHUNK_SIZE, confidence=0.95, seed=None):
+    """
+    Prix Monte Carlo d'un payoff dépendant de la trajectoire, en mémoire bornée.
+
+    Les trajectoires sont simulées pas à pas par blocs de chunk_size ; seul l'état du payoff
+    (start/update/payoff) est conservé, jamais la matrice (n_simulations, n_steps).
+    Chaque bloc a son propre flux SeedSequence.spawn (résultat reproductible).
+    Retourne un dict : price, std_error, conf_int, n_simulations.
+    """
+    dt = T / n_steps
+    drift = (r - 0.5 * vol**2) * dt
+    diffusion = vol * np.sqrt(dt)
+    discount = np.exp(-r * T)
+
+    sizes = _block_sizes(n_simulations, chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    stats = (0, 0.0, 0.0)
+
+    for n, seed_seq in zip(sizes, seeds):
+        rng = np.random.default_rng(seed_seq)
+        S = np.full(n, float(S0))
+        state = payoff.start(S)
+        for _ in range(n_steps):
+            S *= np.exp(drift + diffusion * rng.standard_normal(n))
+            payoff.update(state, S)
+        stats = _merge_stats(stats, _chunk_stats(discount * payoff.payoff(state, S)))
+
+    return _summarize_stats(stats, confidence)
+
+def asian_option_price(S0, K, r, vol, T, option_type='call', averaging='arithmetic', n_steps=252, **kwargs):
+    """Option asiatique (moyenne sur les n_steps dates d'observation)."""
+    return path_dependent_price(S0, r, vol, T, AsianPayoff(K, option_type, averaging), n_steps, **kwargs)
+
+def barrier_option_price(S0, K, r, vol, T, barrier, barrier_type='up-and-out', option_type='call',
+                         rebate=0.0, n_steps=252, **kwargs):
+    """Option à barrière surveillée aux n_steps dates de simulation."""
+    payoff = BarrierPayoff(K, barrier, barrier_type, option_type, rebate)
+    return path_dependent_price(S0, r, vol, T, payoff, n_steps, **kwargs)
+
+def lookback_option_price(S0, r, vol, T, option_type='call', strike_type='floating', K=None, n_steps=252, **kwargs):
+    """Option lookback à strike flottant ou fixe."""
+    return path_dependent_price(S0, r, vol, T, LookbackPayoff(option_type, strike_type, K), n_steps, **kwargs)
+
+def _lsm_basis(x):
+    """Base de régression de Longstaff-Schwartz : polynômes de degré 2 en S/K."""
+    return np.column_stack([np.ones_like(x), x, x * x])
+
+def _lsm_regression(S0, K, r, vol, T, option_type, n_exercise, n_paths, rng):
+    """
+    Passe de régression de Longstaff-Schwartz sur n_paths trajectoires générées à rebours.
+
+    W(T) est tiré en premier puis chaque W(t_k) est obtenu à partir de W(t_{k+1}) par pont brownien,
+    ce qui permet l'induction rétrograde avec une mémoire O(n_paths). Retourne les coefficients de
+    la valeur de continuation à chaque date d'exercice (None si trop peu de trajectoires dans la monnaie)
+    et le prix intra-échantillon.
+    """
+    dt = T / n_exercise
+    growth = r - 0.5 * vol**2
+    step_discount = np.exp(-r * dt)
+
+    W = np.sqrt(T) * rng.standard_normal(n_paths)
+    S = S0 * np.exp(growth * T + vol * W)
+    cashflow = european_payoff(S, K, option_type)
+    coefficients = [None] * n_exercise
+
+    for k in range(n_exercise - 1, 0, -1):
+        t, t_next = k * dt, (k + 1) * dt
+        W = W * t / t_next + np.sqrt(t * dt / t_next) * rng.standard_normal(n_paths)
+        S = S0 * np.exp(growth * t + vol * W)
+        cashflow *= step_discount
+
+        exercise = european_payoff(S, K, option_type)
+        itm = np.flatnonzero(exercise > 0)
+        if itm.size <= 3:
+            continue
+        basis = _lsm_basis(S[itm] / K)
+        beta = np.linalg.lstsq(basis, cashflow[itm], rcond=None)[0]
+        coefficients[k] = beta
+
+        exercised = itm[exercise[itm] > basis @ beta]
+        cashflow[exercised] = exercise[exercised]
+
+    in_sample = float(np.mean(cashflow * step_discount))
+    return coefficients, max(in_sample, float(european_payoff(np.float64(S0), K, option_type)))
+
+def american_option_price(S0, K, r, vol, T, option_type='put', n_exercise=50, n_simulations=200_000,
+                          n_regression_paths=100_000, chunk_size=DEFAULT_CHUNK_SIZE, confidence=0.95, seed=None):
+    """
+    Option américaine (approchée par n_exercise dates d'exercice) ou bermudéenne, par Longstaff-Schwartz.
+
+    1. Régression de la valeur de continuation sur n_regression_paths trajectoires simulées à rebours.
+    2. Valorisation sur n_simulations trajectoires indépendantes, par blocs : chaque trajectoire est
+       exercée à la première date où le payoff dépasse la continuation estimée (estimateur biaisé bas).
+    Retourne un dict : price, std_error, conf_int, n_simulations, in_sample_price.
+    """
+    seq_regression, seq_pricing = np.random.SeedSequence(seed).spawn(2)
+    coefficients, in_sample = _lsm_regression(S0, K, r, vol, T, option_type, n_exercise, n_regression_paths,
+                                              np.random.default_rng(seq_regression))
+
+    dt = T / n_exercise
+    drift = (r - 0.5 * vol**2) * dt
+    diffusion = vol * np.sqrt(dt)
+    sizes = _block_sizes(n_simulations, chunk_size)
+    seeds = seq_pricing.spawn(len(sizes))
+    stats = (0, 0.0, 0.0)
+
+    for n, seed_seq in zip(sizes, seeds):
+        rng = np.random.default_rng(seed_seq)
+        S = np.full(n, float(S0))
+        value = np.zeros(n)
+        alive = np.ones(n, dtype=bool)
+
+        for k in range(1, n_exercise + 1):
+            S *= np.exp(drift + diffusion * rng.standard_normal(n))
+            exercise = european_payoff(S, K, option_type)
+            if k == n_exercise:
+                stop = alive
+            elif coefficients[k] is None:
+                continue
+            else:
+                candidates = np.flatnonzero(alive & (exercise > 0))
+                continuation = _lsm_basis(S[candidates] / K) @ coefficients[k]
+                stop = np.zeros(n, dtype=bool)
+                stop[candidates[exercise[candidates] > continuation]] = True
+            value[stop] = np.exp(-r * k * dt) * exercise[stop]
+            alive &= ~stop
+
+        stats = _merge_stats(stats, _chunk_stats(value))
+
+    result = _summarize_stats(stats, confidence)
+    # Exercice immédiat possible à t = 0
+    intrinsic = float(european_payoff(np.float64(S0), K, option_type))
+    if intrinsic > result['price']:
+        result.update(price=intrinsic, std_error=0.0, conf_int=(intrinsic, intrinsic))
+    result['in_sample_price'] = in_sample
+    return result
+
+if __name__ == "__main__":
+    S0, K, r, vol, T = 100, 100, 0.05, 0.2, 1.0
+    print(f"Asiatique (call arithmétique) : {asian_option_price(S0, K, r, vol, T, seed=0)['price']:.4f}")
+    print(f"Barrière (call up-and-out 130) : {barrier_option_price(S0, K, r, vol, T, 130, seed=0)['price']:.4f}")
+    print(f"Lookback (call flottant)       : {lookback_option_price(S0, r, vol, T, seed=0)['price']:.4f}")
+    print(f"Américaine (put)               : {american_option_price(S0, K, r, vol, T, seed=0)['price']:.4f}")
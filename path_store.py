@@ -0,0 +1,212 @@
+"""
+path_store.py
+-------------
+Stockage hors mémoire de trajectoires Monte Carlo simulées (fichier .npy mappé en mémoire).
+
+Fonctionnalités :
+- Écriture des trajectoires par blocs directement dans un .npy mappé en mémoire (jamais la matrice en RAM)
+- Stockage float32 (défaut, deux fois plus compact) ou float64
+- En-tête de métadonnées (fichier JSON voisin) : graine, paramètres du modèle, taille des blocs
+- Analyses paresseuses sur le fichier : réévaluation de payoffs (européens ou dépendant de la trajectoire),
+  sous-échantillonnage pour les graphiques, statistiques par pas de temps
+- Reproductible : mêmes paramètres et même graine => mêmes trajectoires (flux SeedSequence par bloc)
+
+Usage :
+    python path_store.py simulate paths.npy --simulations 5000000 --steps 252 --seed 42
+    python path_store.py price paths.npy --strike 105
+    python path_store.py stats paths.npy
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+from monte_carlo import (_block_sizes, _chunk_stats, _decimated_columns, _merge_stats, _summarize_stats,
+                         european_payoff)
+
+DEFAULT_CHUNK_SIZE = 20_000
+DEFAULT_DTYPE = 'float32'
+FORMAT_VERSION = 1
+
+def _metadata_path(path):
+    return path + '.json'
+
+def write_paths(path, S0, r, vol, T, n_steps=252, n_simulations=100_000, chunk_size=DEFAULT_CHUNK_SIZE,
+                dtype=DEFAULT_DTYPE, seed=None):
+    """
+    Simule n_simulations trajectoires de mouvement brownien géométrique et les écrit dans path (.npy).
+
+    Chaque bloc de chunk_size trajectoires est simulé en float64 sur son propre flux SeedSequence.spawn,
+    converti en dtype puis écrit dans le fichier mappé : la mémoire utilisée ne dépend que de chunk_size.
+    L'entropie de la graine est enregistrée dans l'en-tête, même si seed=None, pour pouvoir rejouer le tirage.
+    Retourne un PathStore ouvert en lecture.
+    """
+    seed_seq = np.random.SeedSequence(seed)
+    sizes = _block_sizes(n_simulations, chunk_size)
+    drift = (r - 0.5 * vol**2) * (T / n_steps)
+    diffusion = vol * np.sqrt(T / n_steps)
+
+    out = np.lib.format.open_memmap(path, mode='w+', dtype=np.dtype(dtype), shape=(n_simulations, n_steps + 1))
+    begin = 0
+    for n, block_seq in zip(sizes, seed_seq.spawn(len(sizes))):
+        rng = np.random.default_rng(block_seq)
+        log_paths = np.cumsum(drift + diffusion * rng.standard_normal((n, n_steps)), axis=1)
+        out[begin:begin + n, 0] = S0
+        out[begin:begin + n, 1:] = S0 * np.exp(log_paths)
+        begin += n
+    out.flush()
+    del out
+
+    metadata = {
+        'version': FORMAT_VERSION,
+        'model': 'gbm',
+        'params': {'S0': S0, 'r': r, 'vol': vol, 'T': T},
+        'n_steps': n_steps,
+        'n_simulations': n_simulations,
+        'chunk_size': chunk_size,
+        'dtype': np.dtype(dtype).name,
+        'seed_entropy': str(seed_seq.entropy),
+        'created': datetime.now().isoformat(timespec='seconds'),
+    }
+    with open(_metadata_path(path), 'w') as f:
+        json.dump(metadata, f, indent=2)
+    return PathStore(path)
+
+
+class PathStore:
+    """
+    Trajectoires stockées sur disque, lues par mapping mémoire.
+
+    Les analyses parcourent le fichier par blocs de lignes (trajectoires contiguës sur disque) et
+    convertissent chaque bloc en float64 : seules les pages lues sont chargées par le système.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.paths = np.load(path, mmap_mode='r')
+        self.metadata = {}
+        if os.path.exists(_metadata_path(path)):
+            with open(_metadata_path(path)) as f:
+                self.metadata = json.load(f)
+
+    @property
+    def n_simulations(self):
+        return self.paths.shape[0]
+
+    @property
+    def n_steps(self):
+        return self.paths.shape[1] - 1
+
+    def times(self):
+        """Dates de simulation (en années) si T est connu, indices des pas sinon."""
+        T = self.metadata.get('params', {}).get('T')
+        return np.linspace(0.0, T, self.n_steps + 1) if T is not None else np.arange(self.n_steps + 1, dtype=float)
+
+    def iter_chunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Blocs (n, n_steps + 1) de trajectoires en float64."""
+        for begin in range(0, self.n_simulations, chunk_size):
+            yield np.asarray(self.paths[begin:begin + chunk_size], dtype=float)
+
+    def terminal(self):
+        """Prix terminaux S_T (une colonne, lue bloc par bloc)."""
+        return np.concatenate([block[:, -1] for block in self.iter_chunks()])
+
+    def price(self, payoff, r=None, T=None, confidence=0.95, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Prix Monte Carlo d'un payoff réévalué sur les trajectoires stockées, sans nouvelle simulation.
+
+        payoff : fonction d'un bloc de trajectoires (n, n_steps + 1) vers les payoffs (n,), ou payoff
+        dépendant de la trajectoire de path_dependent (AsianPayoff, BarrierPayoff, LookbackPayoff...).
+        r, T : taux d'actualisation et maturité (défaut : ceux de la simulation, lus dans l'en-tête ;
+        ValueError s'ils n'y figurent pas). Retourne price, std_error, conf_int, n_simulations.
+        """
+        params = self.metadata.get('params', {})
+        r = params.get('r') if r is None else r
+        T = params.get('T') if T is None else T
+        missing = [name for name, value in (('r', r), ('T', T)) if value is None]
+        if missing:
+            raise ValueError(f"Paramètres {missing} absents de l'en-tête de {self.path} : à passer explicitement")
+        discount = np.exp(-r * T)
+        stats = (0, 0.0, 0.0)
+        for block in self.iter_chunks(chunk_size):
+            if hasattr(payoff, 'start'):
+                state = payoff.start(block[:, 0])
+                for t in range(1, self.n_steps + 1):
+                    payoff.update(state, block[:, t])
+                values = payoff.payoff(state, block[:, -1])
+            else:
+                values = payoff(block)
+            stats = _merge_stats(stats, _chunk_stats(discount * values))
+        return _summarize_stats(stats, confidence)
+
+    def european_price(self, K, option_type='call', **kwargs):
+        """Prix d'une option européenne vanille à partir des prix terminaux stockés."""
+        return self.price(lambda block: european_payoff(block[:, -1], K, option_type), **kwargs)
+
+    def subsample(self, n_paths=100, max_points=500):
+        """
+        Échantillon pour graphique : les n_paths premières trajectoires, décimées à max_points dates au plus
+        (la date finale est toujours conservée). Retourne (temps, trajectoires (n_paths, points)).
+        """
+        columns = _decimated_columns(self.n_steps + 1, max_points)
+        sample = np.asarray(self.paths[:n_paths], dtype=float)[:, columns]
+        return self.times()[columns], sample
+
+    def step_statistics(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Statistiques par pas de temps sur toutes les trajectoires (une passe) : DataFrame
+        t, mean, std, min, max. Moyennes et variances fusionnées par bloc (_merge_stats, colonne par colonne).
+        """
+        import pandas as pd
+        stats = (0, 0.0, 0.0)
+        low, high = np.inf, -np.inf
+        for block in self.iter_chunks(chunk_size):
+            mean_b = block.mean(axis=0)
+            stats = _merge_stats(stats, (block.shape[0], mean_b, ((block - mean_b)**2).sum(axis=0)))
+            low, high = np.minimum(low, block.min(axis=0)), np.maximum(high, block.max(axis=0))
+        n, mean, m2 = stats
+        std = np.sqrt(m2 / (n - 1)) if n > 1 else np.full(self.n_steps + 1, np.nan)
+        return pd.DataFrame({'t': self.times(), 'mean': mean, 'std': std, 'min': low, 'max': high})
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trajectoires Monte Carlo stockées hors mémoire.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    simulate = sub.add_parser('simulate', help="Simule et écrit des trajectoires")
+    simulate.add_argument('path')
+    simulate.add_argument('--S0', type=float, default=100.0)
+    simulate.add_argument('--r', type=float, default=0.02)
+    simulate.add_argument('--vol', type=float, default=0.25)
+    simulate.add_argument('--T', type=float, default=1.0)
+    simulate.add_argument('--steps', type=int, default=252)
+    simulate.add_argument('--simulations', type=int, default=1_000_000)
+    simulate.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    simulate.add_argument('--dtype', choices=('float32', 'float64'), default=DEFAULT_DTYPE)
+    simulate.add_argument('--seed', type=int, default=None)
+    price = sub.add_parser('price', help="Prix d'une option européenne sur les trajectoires stockées")
+    price.add_argument('path')
+    price.add_argument('--strike', type=float, required=True)
+    price.add_argument('--type', choices=('call', 'put'), default='call')
+    price.add_argument('--r', type=float, default=None, help="Taux (défaut : celui de l'en-tête)")
+    price.add_argument('--T', type=float, default=None, help="Maturité (défaut : celle de l'en-tête)")
+    stats = sub.add_parser('stats', help="Statistiques par pas de temps")
+    stats.add_argument('path')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == 'simulate':
+        store = write_paths(args.path, args.S0, args.r, args.vol, args.T, args.steps, args.simulations,
+                            args.chunk_size, args.dtype, args.seed)
+        size = os.path.getsize(args.path) / 1e9
+        print(f"{store.n_simulations} trajectoires x {store.n_steps} pas écrites dans {args.path} "
+              f"({size:.2f} Go) en {time.perf_counter() - start:.1f} s")
+    elif args.command == 'price':
+        result = PathStore(args.path).european_price(args.strike, args.type, r=args.r, T=args.T)
+        print(f"Prix : {result['price']:.4f} ± {result['std_error']:.4f} "
+              f"(IC : {result['conf_int'][0]:.4f} - {result['conf_int'][1]:.4f}) "
+              f"en {time.perf_counter() - start:.1f} s")
+    else:
+        store = PathStore(args.path)
+        print(store.step_statistics().iloc[::max(1, store.n_steps // 12)].to_string(index=False))
@@ -5,75 +5,53 @@ Visualisation du prix et des Greeks d'une option européenne selon Black-Scholes
 
 Fonctionnalités :
 - Affichage du prix théorique en fonction du prix spot
-- Tracé dynamique des principaux Greeks (Delta, Gamma, Vega, Theta, Rho)
+- Tracé dynamique des principaux Greeks (Delta, Gamma, Vega, Theta, Rho), réutilisable en mode headless (reports)
 - Récupération automatique des données de marché via yFinance
 - Interface interactive en ligne de commande
 """
 
 import numpy as np
-import matplotlib.pyplot as plt
-from black_scholes import black_scholes_price, black_scholes_greeks
-from data_fetcher import get_stock_data
+from black_scholes import black_scholes_batch
 
-def plot_greeks_vs_spot(S0, K, T, r, vol, option_type='call', spread=0.3):
-    """Trace le prix et les Greeks en fonction du prix spot autour de S0."""
+GREEK_PANELS = (("Prix de l'option", "Prix"), ("Delta", "Delta"), ("Gamma", "Gamma"),
+                ("Vega", "Vega"), ("Theta", "Theta"), ("Rho", "Rho"))
+
+def greeks_vs_spot(S0, K, T, r, vol, option_type='call', spread=0.3, n_points=200):
+    """Calcule le prix et les Greeks sur une grille de prix spot autour de S0 (sans tracé), en une passe vectorisée."""
     S_min = S0 * (1 - spread)
     S_max = S0 * (1 + spread)
-    S = np.linspace(S_min, S_max, 200)
-
-    prices, deltas, gammas, vegas, thetas, rhos = [], [], [], [], [], []
-
-    for s in S:
-        prices.append(black_scholes_price(s, K, T, r, vol, option_type))
-        d, g, v, t, rho = black_scholes_greeks(s, K, T, r, vol, option_type)
-        deltas.append(d)
-        gammas.append(g)
-        vegas.append(v)
-        thetas.append(t)
-        rhos.append(rho)
-
-    plt.figure(figsize=(12, 8))
-
-    plt.subplot(2, 3, 1)
-    plt.plot(S, prices)
-    plt.title("Prix de l'option")
-    plt.xlabel("Prix spot (S)")
-    plt.ylabel("Prix")
-
-    plt.subplot(2, 3, 2)
-    plt.plot(S, deltas)
-    plt.title("Delta")
-    plt.xlabel("Prix spot (S)")
-    plt.ylabel("Delta")
-
-    plt.subplot(2, 3, 3)
-    plt.plot(S, gammas)
-    plt.title("Gamma")
-    plt.xlabel("Prix spot (S)")
-    plt.ylabel("Gamma")
-
-    plt.subplot(2, 3, 4)
-    plt.plot(S, vegas)
-    plt.title("Vega")
-    plt.xlabel("Prix spot (S)")
-    plt.ylabel("Vega")
-
-    plt.subplot(2, 3, 5)
-    plt.plot(S, thetas)
-    plt.title("Theta")
-    plt.xlabel("Prix spot (S)")
-    plt.ylabel("Theta")
-
-    plt.subplot(2, 3, 6)
-    plt.plot(S, rhos)
-    plt.title("Rho")
-    plt.xlabel("Prix spot (S)")
-    plt.ylabel("Rho")
-
-    plt.tight_layout()
+    S = np.linspace(S_min, S_max, n_points)
+
+    greeks = black_scholes_batch(S, K, T, r, vol, option_type)
+    prices, deltas, gammas = greeks['price'], greeks['delta'], greeks['gamma']
+    vegas, thetas, rhos = greeks['vega'], greeks['theta'], greeks['rho']
+
+    return S, prices, deltas, gammas, vegas, thetas, rhos
+
+def draw_greeks_vs_spot(fig, S0, K, T, r, vol, option_type='call', spread=0.3):
+    """Trace le prix et les Greeks (grille 2 x 3) sur une figure matplotlib existante (interactive ou headless)."""
+    S, *series = greeks_vs_spot(S0, K, T, r, vol, option_type, spread)
+
+    for i, ((title, ylabel), values) in enumerate(zip(GREEK_PANELS, series), start=1):
+        ax = fig.add_subplot(2, 3, i)
+        ax.plot(S, values)
+        ax.set_title(title)
+        ax.set_xlabel("Prix spot (S)")
+        ax.set_ylabel(ylabel)
+
+    fig.tight_layout()
+    return fig
+
+def plot_greeks_vs_spot(S0, K, T, r, vol, option_type='call', spread=0.3):
+    """Trace le prix et les Greeks en fonction du prix spot autour de S0."""
+    import matplotlib.pyplot as plt
+
+    draw_greeks_vs_spot(plt.figure(figsize=(12, 8)), S0, K, T, r, vol, option_type, spread)
     plt.show()
 
 if __name__ == "__main__":
+    from data_fetcher import get_stock_data
+
     ticker = input("Entrez le ticker (ex: AAPL, MSFT, ^GSPC) : ").upper()
     period = input("Entrez la période (ex: 1mo, 3mo, 1y) : ").lower()
 
@@ -0,0 +1,285 @@
+"""
+pricing_server.py
+-----------------
+Serveur de pricing résident (HTTP/JSON, asyncio) construit sur black_scholes.
+
+Fonctionnalités :
+- Endpoints POST /price, /greeks et /iv (scalaires ou tableaux)
+- Regroupement des requêtes simultanées en micro-lots évalués de façon vectorisée
+- Données de marché gardées en mémoire (spot, vol, taux résolus à partir d'un ticker), rafraîchies après MARKET_TTL
+- Endpoint GET /metrics : percentiles de latence par endpoint (et mesures de metrics.py si activées)
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import time
+from collections import deque
+
+import numpy as np
+import metrics
+from black_scholes import option_type_mask, black_scholes_batch, implied_volatility_batch
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+MAX_BATCH = 8192      # nombre maximal de contrats par micro-lot
+MAX_DELAY = 0.0       # attente supplémentaire (s) pour compléter un micro-lot (0 : lots naturels)
+LATENCY_WINDOW = 10000
+MARKET_TTL = 15 * 60  # durée de vie (s) des données de marché gardées en mémoire
+ROUTES = ('/price', '/greeks', '/iv', '/metrics', '/health')  # autres chemins : latence sous 'other'
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 500: 'Internal Server Error'}
+
+def _json_safe(value):
+    """Remplace récursivement NaN et ±inf par None (null) : JSON strict, lisible par tous les clients."""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {k: _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    return value
+
+
+class MicroBatcher:
+    """
+    Regroupe les requêtes en attente (jusqu'à max_batch contrats, avec une fenêtre optionnelle de
+    max_delay secondes) et les évalue en un seul appel vectorisé de fn. Sous charge, les requêtes
+    arrivées pendant l'évaluation d'un lot forment naturellement le lot suivant.
+    """
+
+    def __init__(self, fn, fields, max_batch=MAX_BATCH, max_delay=MAX_DELAY):
+        self.fn = fn
+        self.fields = fields
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.queue = asyncio.Queue()
+        self.task = None
+
+    async def submit(self, inputs):
+        """Soumet un dict de tableaux (déjà à la même taille) et attend le dict de résultats correspondant."""
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((inputs, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            size = batch[0][0]['n']
+
+            # On laisse d'abord les requêtes déjà en cours s'enfiler, puis on vide la file
+            await asyncio.sleep(0)
+            while size < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                size += batch[-1][0]['n']
+
+            # Fenêtre d'attente optionnelle pour grossir le lot (au prix de la latence)
+            deadline = loop.time() + self.max_delay
+            while size < self.max_batch and self.max_delay > 0:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += item[0]['n']
+
+            try:
+                args = {f: np.concatenate([inputs[f] for inputs, _ in batch]) for f in self.fields}
+                results = self.fn(**args)
+                bounds = np.cumsum([0] + [inputs['n'] for inputs, _ in batch])
+                for (inputs, future), start, stop in zip(batch, bounds[:-1], bounds[1:]):
+                    if not future.done():
+                        future.set_result({name: values[start:stop] for name, values in results.items()})
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+
+class LatencyTracker:
+    """Latences récentes par endpoint et leurs percentiles (en millisecondes)."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.samples = {}
+        self.window = window
+
+    def record(self, endpoint, seconds):
+        self.samples.setdefault(endpoint, deque(maxlen=self.window)).append(seconds * 1000)
+
+    def summary(self):
+        report = {}
+        for endpoint, samples in self.samples.items():
+            values = np.fromiter(samples, dtype=float)
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            report[endpoint] = {'count': len(values), 'p50_ms': float(p50), 'p90_ms': float(p90),
+                                'p99_ms': float(p99), 'max_ms': float(values.max())}
+        return report
+
+
+class PricingServer:
+    """Serveur HTTP minimal (HTTP/1.1, keep-alive) exposant le modèle Black-Scholes."""
+
+    def __init__(self, max_batch=MAX_BATCH, max_delay=MAX_DELAY, market_ttl=MARKET_TTL):
+        self.greeks = MicroBatcher(self._greeks_kernel, ('S', 'K', 'T', 'r', 'vol', 'is_call'), max_batch, max_delay)
+        self.iv = MicroBatcher(self._iv_kernel, ('S', 'K', 'T', 'r', 'market_price', 'is_call'), max_batch, max_delay)
+        self.latency = LatencyTracker()
+        self.market = {}  # ticker -> (instant du téléchargement, données de marché)
+        self.market_ttl = market_ttl
+
+    @staticmethod
+    def _greeks_kernel(S, K, T, r, vol, is_call):
+        return black_scholes_batch(S, K, T, r, vol, is_call)
+
+    @staticmethod
+    def _iv_kernel(S, K, T, r, market_price, is_call):
+        result = implied_volatility_batch(S, K, T, r, market_price, is_call)
+        result['status'] = result['status'].astype(str)
+        return result
+
+    async def _market_inputs(self, ticker):
+        """Spot, vol et taux d'un ticker, gardés en mémoire market_ttl secondes puis téléchargés à nouveau."""
+        fetched_at, inputs = self.market.get(ticker, (None, None))
+        if fetched_at is None or time.monotonic() - fetched_at > self.market_ttl:
+            from data_fetcher import get_stock_data
+            data = await asyncio.get_running_loop().run_in_executor(None, get_stock_data, ticker)
+            if not data:
+                raise ValueError(f"Aucune donnée de marché pour {ticker}")
+            inputs = {'S': data['Spot Price (USD)'], 'vol': data['Volatility (%)'] / 100,
+                      'r': data['Risk-Free Rate (%)'] / 100}
+            self.market[ticker] = (time.monotonic(), inputs)
+        return inputs
+
+    async def _prepare(self, payload, fields):
+        """Complète la requête avec les données de marché si besoin et aligne les tableaux."""
+        if 'ticker' in payload:
+            payload = {**await self._market_inputs(payload['ticker'].upper()), **payload}
+        missing = [f for f in fields if f not in payload]
+        if missing:
+            raise ValueError(f"Champs manquants : {missing}")
+
+        scalar = all(np.ndim(payload[f]) == 0 for f in fields) and np.ndim(payload.get('option_type', 'call')) == 0
+        arrays = np.broadcast_arrays(*[np.asarray(payload[f], dtype=float) for f in fields],
+                                     option_type_mask(payload.get('option_type', 'call')))
+        inputs = {f: np.ravel(a) for f, a in zip(fields + ('is_call',), arrays)}
+        inputs['n'] = inputs['S'].size
+        return inputs, scalar
+
+    @staticmethod
+    def _format(results, names, scalar):
+        """Résultats en types JSON ; les valeurs non finies (NaN, inf) deviennent null."""
+        response = {}
+        for name in names:
+            values = results[name]
+            if values.dtype.kind == 'f':
+                values = np.where(np.isfinite(values), values, None)
+            values = values.tolist()
+            response[name] = values[0] if scalar else values
+        return response
+
+    async def handle(self, method, path, payload):
+        """Traite une requête et retourne (code HTTP, corps JSON)."""
+        if method == 'GET' and path == '/metrics':
+            return 200, _json_safe({'latency': self.latency.summary(), 'tickers_in_memory': sorted(self.market),
+                                    'instrumentation': metrics.snapshot() if metrics.ENABLED else None})
+        if method == 'GET' and path == '/health':
+            return 200, {'status': 'ok'}
+        if method != 'POST':
+            return 404, {'error': f"Route inconnue : {method} {path}"}
+
+        if path in ('/price', '/greeks'):
+            inputs, scalar = await self._prepare(payload, ('S', 'K', 'T', 'r', 'vol'))
+            results = await self.greeks.submit(inputs)
+            names = ('price',) if path == '/price' else ('price', 'delta', 'gamma', 'vega', 'theta', 'rho')
+            return 200, self._format(results, names, scalar)
+        if path == '/iv':
+            inputs, scalar = await self._prepare(payload, ('S', 'K', 'T', 'r', 'market_price'))
+            results = await self.iv.submit(inputs)
+            return 200, self._format(results, ('vol', 'iterations', 'status'), scalar)
+        return 404, {'error': f"Route inconnue : {method} {path}"}
+
+    async def _respond(self, request_line, headers, reader):
+        """
+        Traite une requête et retourne (code HTTP, corps JSON encodé, route, fermeture de connexion).
+        Requête mal formée ou invalide : 400 ; erreur inattendue : 500 (journalisée), sans couper le serveur.
+        """
+        path, close = 'invalid', False
+        try:
+            try:
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                length = int(headers.get('content-length', 0))
+                if length < 0:
+                    raise ValueError(length)
+            except ValueError:
+                # Découpage du flux incertain : on répond puis on ferme la connexion
+                close = True
+                raise ValueError(f"Requête HTTP mal formée : {request_line[:100]!r}")
+            body = await reader.readexactly(length)
+            status, response = await self.handle(method, path, json.loads(body) if body else {})
+        except asyncio.IncompleteReadError:
+            raise
+        except (ValueError, KeyError, TypeError) as e:
+            status, response = 400, {'error': str(e)}
+        except Exception as e:
+            logging.exception(f"Erreur interne sur {request_line[:100]!r}")
+            status, response = 500, {'error': f"Erreur interne : {type(e).__name__}"}
+
+        try:
+            data = json.dumps(response, allow_nan=False).encode()
+        except ValueError as e:
+            logging.exception(f"Réponse non sérialisable pour {path}")
+            status, data = 500, json.dumps({'error': f"Erreur interne : {e}"}).encode()
+        return status, data, path, close
+
+    async def _serve_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                start = time.perf_counter()
+                status, data, path, close = await self._respond(request_line, headers, reader)
+                self.latency.record(path if path in ROUTES else 'other', time.perf_counter() - start)
+
+                writer.write(f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}\r\n"
+                             f"Content-Type: application/json\r\n"
+                             f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+                await writer.drain()
+                if close or headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        server = await asyncio.start_server(self._serve_connection, host, port)
+        print(f"Serveur de pricing à l'écoute sur http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serveur de pricing Black-Scholes résident.")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH)
+    parser.add_argument('--max-delay-ms', type=float, default=MAX_DELAY * 1000)
+    parser.add_argument('--market-ttl', type=float, default=MARKET_TTL,
+                        help="Durée de vie (s) des données de marché gardées en mémoire")
+    args = parser.parse_args()
+
+    asyncio.run(PricingServer(args.max_batch, args.max_delay_ms / 1000, args.market_ttl).serve(args.host, args.port))
@@ -0,0 +1,175 @@
+"""
+reports.py
+----------
+Rendu headless et parallèle des graphiques d'analyse pour de nombreux tickers.
+
+Fonctionnalités :
+- Figures matplotlib construites sans pyplot (backend Agg, aucun affichage ni boucle d'événements)
+- Mêmes tracés que les outils interactifs (plotter, monte_carlo, vol_smile, vol_smile_real),
+  via leurs fonctions draw_*
+- Trajectoires Monte Carlo dessinées en une seule LineCollection, décimées en temps
+- Rapports de plusieurs tickers rendus en parallèle dans un pool de processus, en PNG et/ou SVG
+- Statut et durée de chaque graphique (une erreur n'interrompt pas le lot)
+
+Usage :
+    python reports.py AAPL MSFT NVDA --output reports --format png svg --workers 8
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+REPORT_KINDS = ('greeks', 'paths', 'convergence', 'smile', 'real_smile')
+DEFAULT_KINDS = ('greeks', 'paths', 'convergence', 'smile')
+DEFAULT_FORMATS = ('png',)
+DEFAULT_DPI = 100
+DEFAULT_OUTPUT_DIR = 'reports'
+
+def _figure(figsize):
+    """Figure autonome rendue par Agg : aucune interaction avec pyplot ni avec l'affichage."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+def _save(fig, base_path, formats=DEFAULT_FORMATS, dpi=DEFAULT_DPI):
+    """Enregistre la figure dans chaque format demandé ; retourne la liste des fichiers écrits."""
+    fig.tight_layout()
+    files = [f'{base_path}.{fmt}' for fmt in formats]
+    for path in files:
+        fig.savefig(path, dpi=dpi)
+    return files
+
+def render_greeks(base_path, S0, K, T, r, vol, option_type='call', formats=DEFAULT_FORMATS, dpi=DEFAULT_DPI):
+    """Prix et Greeks en fonction du spot (plotter.plot_greeks_vs_spot, sans affichage)."""
+    from plotter import draw_greeks_vs_spot
+    return _save(draw_greeks_vs_spot(_figure((12, 8)), S0, K, T, r, vol, option_type), base_path, formats, dpi)
+
+def render_paths(base_path, paths, max_paths=100, max_points=500, formats=DEFAULT_FORMATS, dpi=DEFAULT_DPI):
+    """Échantillon de trajectoires (matrice ou path_store.PathStore), en une LineCollection décimée."""
+    from monte_carlo import draw_paths
+    fig = _figure((10, 5))
+    draw_paths(fig.add_subplot(), paths, max_paths, max_points)
+    return _save(fig, base_path, formats, dpi)
+
+def render_convergence(base_path, S0, K, r, vol, T, max_sim=10_000, seed=None, formats=DEFAULT_FORMATS,
+                       dpi=DEFAULT_DPI):
+    """Convergence du prix Monte Carlo vers Black-Scholes (monte_carlo.convergence_analysis, sans affichage)."""
+    from black_scholes import black_scholes_price
+    from monte_carlo import convergence_profile, draw_convergence
+    fig = _figure((10, 5))
+    profile = convergence_profile(S0, K, r, vol, T, max_sim=max_sim, seed=seed)
+    draw_convergence(fig.add_subplot(), profile, black_scholes_price(S0, K, T, r, vol))
+    return _save(fig, base_path, formats, dpi)
+
+def render_smile(base_path, strikes, iv_list, title, formats=DEFAULT_FORMATS, dpi=DEFAULT_DPI, xlabel="Strike"):
+    """Smile de volatilité (vol_smile.plot_smile, sans affichage) ; volatilités en décimal."""
+    from vol_smile import draw_smile
+    fig = _figure((10, 6))
+    draw_smile(fig.add_subplot(), strikes, iv_list, title, xlabel)
+    return _save(fig, base_path, formats, dpi)
+
+def ticker_report(ticker, output_dir=DEFAULT_OUTPUT_DIR, kinds=DEFAULT_KINDS, formats=DEFAULT_FORMATS,
+                  T=0.5, option_type='call', moneyness=1.0, n_paths=100, n_steps=252, max_sim=10_000,
+                  maturity_days=30, seed=None, dpi=DEFAULT_DPI):
+    """
+    Rapport d'un ticker : un fichier par graphique et par format dans output_dir/<TICKER>/.
+
+    Spot, volatilité historique et taux proviennent de monte_carlo.get_market_data ; le strike vaut
+    moneyness × spot. Seules les n_paths trajectoires tracées sont simulées, avec la graine seed
+    (comme la convergence). Retourne une ligne par graphique : ticker, kind, files, seconds, status, error.
+    """
+    from monte_carlo import get_market_data, simulate_paths
+    from vol_smile import generate_smile
+    from vol_smile_real import STRIKE_LABEL, real_smile
+
+    folder = os.path.join(output_dir, ticker.upper())
+    os.makedirs(folder, exist_ok=True)
+    rows = []
+    try:
+        S0, vol, r = (float(x) for x in get_market_data(ticker))
+    except Exception as e:
+        return [{'ticker': ticker, 'kind': kind, 'files': [], 'seconds': 0.0, 'status': 'error', 'error': str(e)}
+                for kind in kinds]
+    K = round(moneyness * S0, 2)
+
+    def render(kind):
+        base = os.path.join(folder, kind)
+        if kind == 'greeks':
+            return render_greeks(base, S0, K, T, r, vol, option_type, formats, dpi)
+        if kind == 'paths':
+            paths = simulate_paths(S0, r, vol, T, n_steps, n_paths, seed=seed)
+            return render_paths(base, paths, max_paths=n_paths, formats=formats, dpi=dpi)
+        if kind == 'convergence':
+            return render_convergence(base, S0, K, r, vol, T, max_sim, seed, formats, dpi)
+        if kind == 'smile':
+            strikes, ivs = generate_smile(S0, T, r, vol, option_type)
+            return render_smile(base, strikes, ivs, f"Smile de volatilité pour {ticker}", formats, dpi)
+        if kind == 'real_smile':
+            smile = real_smile(ticker, option_type, maturity_days)
+            if smile is None or not len(smile[0]):
+                raise ValueError("Pas de volatilités implicites valides à tracer.")
+            strikes, ivs, expiry = smile
+            title = f"Smile de volatilité implicite ({ticker} - {option_type.upper()})\nÉchéance : {expiry}"
+            return render_smile(base, strikes, ivs, title, formats, dpi, STRIKE_LABEL)
+        raise ValueError(f"Graphique inconnu : {kind} (choix : {', '.join(REPORT_KINDS)})")
+
+    for kind in kinds:
+        start = time.perf_counter()
+        try:
+            files, status, error = render(kind), 'ok', ''
+        except Exception as e:
+            files, status, error = [], 'error', str(e)
+        rows.append({'ticker': ticker, 'kind': kind, 'files': files, 'seconds': time.perf_counter() - start,
+                     'status': status, 'error': error})
+    return rows
+
+def _ticker_report_job(args):
+    ticker, options = args
+    return ticker_report(ticker, **options)
+
+def render_reports(tickers, output_dir=DEFAULT_OUTPUT_DIR, max_workers=None, **options):
+    """
+    Rapports de plusieurs tickers en parallèle (un processus par ticker à la fois, max_workers processus).
+
+    Le rendu matplotlib (Agg) étant lié au GIL, un pool de processus est utilisé plutôt que des threads.
+    options : voir ticker_report. Retourne un DataFrame : ticker, kind, files, seconds, status, error.
+    """
+    tickers = list(dict.fromkeys(t.upper() for t in tickers))
+    options['output_dir'] = output_dir
+    if max_workers == 1:
+        results = [ticker_report(t, **options) for t in tickers]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_ticker_report_job, [(t, options) for t in tickers]))
+    return pd.DataFrame([row for rows in results for row in rows],
+                        columns=['ticker', 'kind', 'files', 'seconds', 'status', 'error'])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rendu headless des graphiques d'analyse pour une liste de tickers.")
+    parser.add_argument('tickers', nargs='+')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT_DIR, help="Répertoire de sortie")
+    parser.add_argument('--format', nargs='+', default=list(DEFAULT_FORMATS), choices=('png', 'svg', 'pdf'))
+    parser.add_argument('--kinds', nargs='+', default=list(DEFAULT_KINDS), choices=REPORT_KINDS)
+    parser.add_argument('--workers', type=int, default=None, help="Processus (défaut : nombre de cœurs)")
+    parser.add_argument('--maturity', type=float, default=0.5, help="Maturité en années")
+    parser.add_argument('--type', choices=('call', 'put'), default='call')
+    parser.add_argument('--paths', type=int, default=100, help="Trajectoires simulées et tracées")
+    parser.add_argument('--seed', type=int, default=None, help="Graine des simulations (rapports reproductibles)")
+    parser.add_argument('--dpi', type=int, default=DEFAULT_DPI)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    report = render_reports(args.tickers, args.output, args.workers, kinds=tuple(args.kinds),
+                            formats=tuple(args.format), T=args.maturity, option_type=args.type,
+                            n_paths=args.paths, seed=args.seed, dpi=args.dpi)
+    n_files = report['files'].map(len).sum()
+    print(f"{n_files} fichier(s) écrit(s) dans {args.output} en {time.perf_counter() - start:.1f} s")
+    failed = report[report['status'] != 'ok']
+    if not failed.empty:
+        print(f"\n{len(failed)} graphique(s) en échec :")
+        print(failed[['ticker', 'kind', 'error']].to_string(index=False))
@@ -0,0 +1,245 @@
+"""
+scenario_risk.py
+----------------
+Moteur de stress tests : revalorisation d'un portefeuille d'options sur une grille de scénarios.
+
+Fonctionnalités :
+- Grille de chocs spot × volatilité × écoulement du temps × taux (produit cartésien)
+- Revalorisation Black-Scholes de toutes les positions sur tous les scénarios en une passe vectorisée
+- P&L et Greeks agrégés par scénario et par sous-jacent
+- Positions non valorisables (sous-jacent sans données de marché, type inconnu) exclues et comptées
+  à côté des totaux, sans fausser les autres sous-jacents
+- Traitement par blocs de positions (mémoire bornée) : grilles sur des dizaines de milliers de positions
+- Lecture directe d'un fichier de positions (même format que batch_pricer) et export CSV/Parquet
+
+Usage :
+    python scenario_risk.py positions.csv --output stress.csv --days 0 1 7
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from black_scholes import black_scholes_batch
+from batch_pricer import REQUIRED_COLUMNS, MarketInputs, iter_positions
+
+DEFAULT_SPOT_SHOCKS = tuple(np.round(np.linspace(-0.2, 0.2, 9), 4))  # variations relatives du spot
+DEFAULT_VOL_SHOCKS = (-0.05, 0.0, 0.05)                                  # points de volatilité (absolus)
+DEFAULT_DAYS = (0, 1, 7)                                                 # jours écoulés
+DEFAULT_RATE_SHOCKS = (0.0,)                                             # variations absolues du taux
+DEFAULT_MAX_CELLS = 500_000   # positions × scénarios évalués à la fois
+MIN_VOL = 1e-4
+MEASURES = ('value', 'pnl', 'delta', 'gamma', 'vega', 'theta', 'rho')
+SCENARIO_COLUMNS = ['scenario', 'spot_shock', 'vol_shock', 'days', 'rate_shock']
+COUNT_COLUMNS = ['positions', 'excluded_positions']
+
+def scenario_grid(spot_shocks=DEFAULT_SPOT_SHOCKS, vol_shocks=DEFAULT_VOL_SHOCKS, days=DEFAULT_DAYS,
+                  rate_shocks=DEFAULT_RATE_SHOCKS):
+    """Produit cartésien des chocs : un scénario par ligne (scenario, spot_shock, vol_shock, days, rate_shock)."""
+    spot, vol, day, rate = np.meshgrid(np.asarray(spot_shocks, dtype=float), np.asarray(vol_shocks, dtype=float),
+                                       np.asarray(days, dtype=float), np.asarray(rate_shocks, dtype=float),
+                                       indexing='ij')
+    return pd.DataFrame({
+        'scenario': np.arange(spot.size),
+        'spot_shock': spot.ravel(),
+        'vol_shock': vol.ravel(),
+        'days': day.ravel(),
+        'rate_shock': rate.ravel(),
+    })
+
+def _prepare_positions(positions, market):
+    """Normalise les colonnes et ajoute spot, vol et r (résolus via market si absents du fichier)."""
+    missing = [c for c in REQUIRED_COLUMNS if c not in positions.columns]
+    if missing:
+        raise ValueError(f"Colonnes manquantes dans le fichier de positions : {missing}")
+
+    positions = positions.copy()
+    positions['ticker'] = positions['ticker'].astype(str).str.upper()
+    positions['type'] = positions['type'].astype(str).str.lower()
+    if not {'spot', 'vol', 'r'}.issubset(positions.columns):
+        inputs = market.resolve(positions['ticker']).reindex(positions['ticker'])
+        for column in ('spot', 'vol', 'r'):
+            positions[column] = inputs[column].to_numpy()
+    return positions
+
+def _revalue(positions, grid):
+    """
+    Prix et Greeks unitaires de chaque position (lignes) dans chaque scénario (colonnes).
+    Les options échues dans un scénario valent leur valeur intrinsèque (Greeks nuls hormis le delta).
+    """
+    column = lambda name: positions[name].to_numpy(float)[:, None]
+    S = column('spot') * (1 + grid['spot_shock'].to_numpy()[None, :])
+    vol = np.maximum(column('vol') + grid['vol_shock'].to_numpy()[None, :], MIN_VOL)
+    T = column('maturity') - grid['days'].to_numpy()[None, :] / 365
+    r = column('r') + grid['rate_shock'].to_numpy()[None, :]
+    K = column('strike')
+    is_call = (positions['type'].to_numpy() == 'call')[:, None]
+
+    expired = T <= 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = black_scholes_batch(S, K, np.where(expired, 1.0, T), r, vol, is_call)
+    if expired.any():
+        intrinsic = np.where(is_call, np.maximum(S - K, 0), np.maximum(K - S, 0))
+        result['price'] = np.where(expired, intrinsic, result['price'])
+        result['delta'] = np.where(expired, np.where(is_call, 1.0 * (S > K), -1.0 * (S < K)), result['delta'])
+        for name in ('gamma', 'vega', 'theta', 'rho'):
+            result[name] = np.where(expired, 0.0, result[name])
+    return result
+
+def _valid_positions(positions):
+    """Masque des positions valorisables : données de marché et caractéristiques finies, type call ou put."""
+    numeric = positions[['spot', 'vol', 'r', 'strike', 'maturity', 'quantity']].apply(pd.to_numeric, errors='coerce')
+    return np.isfinite(numeric.to_numpy(float)).all(axis=1) & positions['type'].isin(['call', 'put']).to_numpy()
+
+class _Totals:
+    """
+    Mesures agrégées par sous-jacent : un tableau (sous-jacents × scénarios) par mesure et les nombres
+    de positions valorisées / exclues ; une ligne est ajoutée à la première apparition d'un sous-jacent.
+    """
+
+    def __init__(self, n_scenarios):
+        self.rows = {}
+        self.measures = {name: np.zeros((0, n_scenarios)) for name in MEASURES}
+        self.counts = {name: np.zeros(0, dtype=np.int64) for name in COUNT_COLUMNS}
+
+    def rows_for(self, tickers):
+        """Lignes des sous-jacents, en ajoutant celles des nouveaux."""
+        new = [t for t in tickers if t not in self.rows]
+        if new:
+            self.rows.update(zip(new, range(len(self.rows), len(self.rows) + len(new))))
+            for name, values in self.measures.items():
+                self.measures[name] = np.vstack([values, np.zeros((len(new), values.shape[1]))])
+            for name, values in self.counts.items():
+                self.counts[name] = np.concatenate([values, np.zeros(len(new), dtype=np.int64)])
+        return np.array([self.rows[t] for t in tickers], dtype=np.intp)
+
+def _accumulate(totals, positions, grid, max_cells=DEFAULT_MAX_CELLS):
+    """
+    Ajoute à totals (_Totals) la contribution d'un bloc de positions.
+
+    L'agrégation par sous-jacent est un produit matriciel : une matrice creuse (sous-jacents × positions)
+    contenant les quantités, multipliée par la matrice (positions × scénarios) des prix ou Greeks.
+    La mémoire reste bornée par max_cells quel que soit le nombre de sous-jacents. Les positions non
+    valorisables en sont retirées au préalable (un NaN contaminerait, via le produit, tous les
+    sous-jacents du bloc) et seulement comptées.
+    """
+    from scipy.sparse import csr_matrix
+
+    n_scenarios = len(grid)
+    rows = max(1, max_cells // n_scenarios)
+    base = scenario_grid((0.0,), (0.0,), (0,), (0.0,))
+
+    valid = _valid_positions(positions)
+    excluded = positions.loc[~valid, 'ticker'].value_counts()
+    target = totals.rows_for(list(excluded.index))
+    totals.counts['excluded_positions'][target] += excluded.to_numpy()
+    positions = positions[valid]
+
+    for begin in range(0, len(positions), rows):
+        chunk = positions.iloc[begin:begin + rows]
+        codes, tickers = pd.factorize(chunk['ticker'])
+        weights = csr_matrix((chunk['quantity'].to_numpy(float), (codes, np.arange(len(chunk)))),
+                             shape=(len(tickers), len(chunk)))
+
+        shocked = _revalue(chunk, grid)
+        current = weights @ _revalue(chunk, base)['price']  # valeur actuelle par sous-jacent, (u, 1)
+        aggregated = {name: weights @ shocked[name] for name in ('delta', 'gamma', 'vega', 'theta', 'rho')}
+        aggregated['value'] = weights @ shocked['price']
+        aggregated['pnl'] = aggregated['value'] - current
+
+        target = totals.rows_for(list(tickers))
+        totals.counts['positions'][target] += np.bincount(codes, minlength=len(tickers))
+        for name in MEASURES:
+            totals.measures[name][target] += aggregated[name]
+    return totals
+
+def _report(totals, grid):
+    """
+    Tables de résultats : (total par scénario, détail par scénario et sous-jacent).
+
+    Chaque ligne porte le nombre de positions valorisées (positions) et exclues (excluded_positions) ;
+    un sous-jacent dont aucune position n'a pu être valorisée a des mesures NaN, et le total ne somme
+    que les positions valorisées (NaN s'il n'y en a aucune).
+    """
+    if not totals.rows:
+        empty = grid.iloc[:0].assign(**{name: pd.Series(dtype=float) for name in MEASURES},
+                                     **{name: pd.Series(dtype=int) for name in COUNT_COLUMNS})
+        return empty, empty.assign(ticker=pd.Series(dtype=str))
+
+    tickers = np.array(list(totals.rows), dtype=object)
+    order = np.argsort(tickers, kind='stable')
+    n_tickers, n_scenarios = len(tickers), len(grid)
+    priced = totals.counts['positions'][order] > 0
+
+    by_underlying = {'scenario': np.tile(grid['scenario'].to_numpy(), n_tickers),
+                     'ticker': np.repeat(tickers[order], n_scenarios)}
+    total = {column: grid[column].to_numpy() for column in SCENARIO_COLUMNS}
+    for column in SCENARIO_COLUMNS[1:]:
+        by_underlying[column] = np.tile(grid[column].to_numpy(), n_tickers)
+    for name in MEASURES:
+        values = totals.measures[name][order]
+        by_underlying[name] = np.where(priced[:, None], values, np.nan).ravel()
+        total[name] = values[priced].sum(axis=0) if priced.any() else np.full(n_scenarios, np.nan)
+    for name in COUNT_COLUMNS:
+        counts = totals.counts[name][order]
+        by_underlying[name] = np.repeat(counts, n_scenarios)
+        total[name] = np.full(n_scenarios, counts.sum())
+    return pd.DataFrame(total), pd.DataFrame(by_underlying)
+
+def run_scenarios(positions, grid=None, market=None, max_cells=DEFAULT_MAX_CELLS):
+    """
+    Stress test d'un portefeuille en mémoire (DataFrame au format de batch_pricer).
+
+    Les colonnes spot, vol et r sont utilisées si présentes, sinon résolues via market
+    (MarketInputs, une seule requête par sous-jacent). Greeks et valeurs sont pondérés par les quantités.
+    Retourne (total, by_underlying) : P&L et Greeks par scénario, puis par scénario et sous-jacent.
+    """
+    grid = scenario_grid() if grid is None else grid
+    market = market or MarketInputs()
+    totals = _accumulate(_Totals(len(grid)), _prepare_positions(positions, market), grid, max_cells)
+    return _report(totals, grid)
+
+def run_scenarios_file(path, grid=None, chunk_size=100_000, period='1y', max_cells=DEFAULT_MAX_CELLS):
+    """Stress test d'un fichier de positions (CSV ou Parquet) lu par blocs ; retourne (total, by_underlying)."""
+    grid = scenario_grid() if grid is None else grid
+    market = MarketInputs(period)
+    totals = _Totals(len(grid))
+    for chunk in iter_positions(path, chunk_size):
+        _accumulate(totals, _prepare_positions(chunk, market), grid, max_cells)
+    return _report(totals, grid)
+
+def _save(frame, path):
+    if path.endswith('.parquet'):
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stress test d'un portefeuille d'options sur une grille de scénarios.")
+    parser.add_argument('input', help="Fichier de positions (.csv ou .parquet)")
+    parser.add_argument('--output', default=None, help="Détail par sous-jacent (.csv ou .parquet)")
+    parser.add_argument('--spot', type=float, nargs='+', default=DEFAULT_SPOT_SHOCKS, help="Chocs relatifs du spot")
+    parser.add_argument('--vol', type=float, nargs='+', default=DEFAULT_VOL_SHOCKS, help="Chocs de volatilité")
+    parser.add_argument('--days', type=float, nargs='+', default=DEFAULT_DAYS, help="Jours écoulés")
+    parser.add_argument('--rate', type=float, nargs='+', default=DEFAULT_RATE_SHOCKS, help="Chocs de taux")
+    parser.add_argument('--chunk-size', type=int, default=100_000)
+    parser.add_argument('--period', default='1y', help="Période de calcul de la volatilité historique")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    grid = scenario_grid(args.spot, args.vol, args.days, args.rate)
+    total, by_underlying = run_scenarios_file(args.input, grid, args.chunk_size, args.period)
+    print(f"{len(grid)} scénario(s) évalué(s) en {time.perf_counter() - start:.1f} s")
+    excluded = by_underlying.groupby('ticker')['excluded_positions'].first()
+    if excluded.sum():
+        print(f"{excluded.sum()} position(s) exclue(s) des totaux (non valorisables) : "
+              f"{', '.join(f'{t} ({n})' for t, n in excluded[excluded > 0].items())}")
+    print()
+
+    worst = total.nsmallest(10, 'pnl')
+    print("=== 10 pires scénarios ===")
+    print(worst.to_string(index=False))
+    if args.output:
+        _save(by_underlying, args.output)
+        print(f"\nDétail par sous-jacent enregistré dans {args.output}")
@@ -10,9 +10,7 @@ Fonctionnalités :
 """
 
 import numpy as np
-import matplotlib.pyplot as plt
 from black_scholes import black_scholes_price, implied_volatility
-from data_fetcher import get_stock_data
 
 def generate_smile(S0, T, r, vol, option_type='call', n_points=20, spread=0.3):
     """Construit un smile de volatilité autour du spot."""
@@ -26,18 +24,27 @@ def generate_smile(S0, T, r, vol, option_type='call', n_points=20, spread=0.3):
 
     return strikes, iv_list
 
+def draw_smile(ax, strikes, iv_list, title, xlabel="Strike"):
+    """Trace un smile (volatilités en décimal) sur des axes matplotlib existants (interactifs ou headless)."""
+    ax.plot(strikes, np.array(iv_list) * 100, marker='o')
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel("Volatilité implicite (%)")
+    ax.grid(True)
+    return ax
+
 def plot_smile(strikes, iv_list, ticker):
     """Trace le smile de volatilité."""
-    plt.figure(figsize=(10, 6))
-    plt.plot(strikes, np.array(iv_list) * 100, marker='o')
-    plt.title(f"Smile de volatilité pour {ticker}")
-    plt.xlabel("Strike")
-    plt.ylabel("Volatilité implicite (%)")
-    plt.grid(True)
-    plt.tight_layout()
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    draw_smile(ax, strikes, iv_list, f"Smile de volatilité pour {ticker}")
+    fig.tight_layout()
     plt.show()
 
 if __name__ == "__main__":
+    from data_fetcher import get_stock_data
+
     ticker = input("Entrez le ticker (ex: AAPL, MSFT, ^GSPC) : ").upper()
     period = input("Entrez la période pour la volatilité historique (ex: 1mo, 3mo, 1y) : ").lower()
 
@@ -6,55 +6,82 @@ Smile de volatilité implicite basé sur des prix d’options réels du marché
 Fonctionnalités :
 - Récupération des chaînes d’options (prix, strikes, bid/ask)
 - Calcul de la volatilité implicite par strike
-- Tracé du smile observé sur le marché
+- Tracé du smile observé sur le marché (real_smile pour les données seules, ex : rapports headless)
+- Relecture d'instantanés enregistrés (option_chains) sans accès réseau
 """
 
-import yfinance as yf
 import numpy as np
-import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
-from black_scholes import implied_volatility
+from black_scholes import IV_STATUS_OK, implied_volatility_batch
+from market_data import get_expirations, get_option_chain, get_last_close, get_risk_free_rate
+from vol_smile import draw_smile
 
-def get_real_smile(ticker, option_type='call', maturity_days=30):
-    """Construit un smile de volatilité implicite à partir des prix du marché."""
-    try:
-        tk = yf.Ticker(ticker)
-        expirations = tk.options
+STRIKE_LABEL = "Prix d'exercice (Strike)"
+
+def real_smile(ticker, option_type='call', maturity_days=30, snapshot=None):
+    """
+    Smile de volatilité implicite observé sur le marché, sans tracé.
+    snapshot : instantané de chaîne déjà nettoyé (option_chains.load_latest_snapshot) ; dans ce cas
+    aucune donnée n'est téléchargée et la maturité est celle de l'instantané.
+    Retourne (strikes, volatilités implicites en décimal, échéance retenue), ou None sans cotation exploitable.
+    """
+    if snapshot is not None:
+        quotes = snapshot[snapshot['type'] == option_type]
+        if quotes.empty:
+            print("Aucune cotation disponible dans l'instantané.")
+            return
+
+        target_T = maturity_days / 365
+        selected_date = quotes['expiry'].iloc[(quotes['T'] - target_T).abs().argmin()]
+        options = quotes[quotes['expiry'] == selected_date]
+        spot, r, T = options['spot'].iloc[0], options['r'].iloc[0], options['T'].iloc[0]
+    else:
+        expirations = get_expirations(ticker)
         if not expirations:
             print("Aucune date d'expiration disponible.")
             return
 
         target_date = (datetime.today() + timedelta(days=maturity_days)).date()
         selected_date = min(expirations, key=lambda d: abs(datetime.strptime(d, "%Y-%m-%d").date() - target_date))
-        chain = tk.option_chain(selected_date)
-        options = chain.calls if option_type == 'call' else chain.puts
+        calls, puts = get_option_chain(ticker, selected_date)
+        options = calls if option_type == 'call' else puts
 
-        spot = tk.history(period="1d")['Close'][-1]
-        r = yf.Ticker("^TNX").history(period="1d")['Close'][-1] / 100 if not yf.Ticker("^TNX").history(period="1d").empty else 0.04
+        spot = get_last_close(ticker)
+        r = get_risk_free_rate()
         T = (datetime.strptime(selected_date, "%Y-%m-%d") - datetime.today()).days / 365
 
-        strikes, implied_vols = [], []
+    # Inversion vectorisée de toute la chaîne ; les strikes non inversibles sont signalés
+    mid_prices = ((options['bid'] + options['ask']) / 2).to_numpy()
+    quoted = mid_prices > 0
+    strikes_all = options['strike'].to_numpy()[quoted]
+    result = implied_volatility_batch(spot, strikes_all, T, r, mid_prices[quoted], option_type)
+
+    solved = result['status'] == IV_STATUS_OK
+    strikes = strikes_all[solved]
+    implied_vols = result['vol'][solved]
+    if (~solved).any():
+        reasons, counts = np.unique(result['status'][~solved], return_counts=True)
+        detail = ', '.join(f"{reason} : {count}" for reason, count in zip(reasons, counts))
+        print(f"{(~solved).sum()} strike(s) ignoré(s), volatilité implicite non inversible ({detail}).")
+
+    return strikes, implied_vols, selected_date
+
+def get_real_smile(ticker, option_type='call', maturity_days=30, snapshot=None):
+    """Construit et trace un smile de volatilité implicite à partir des prix du marché (voir real_smile)."""
+    try:
+        smile = real_smile(ticker, option_type, maturity_days, snapshot)
+        if smile is None:
+            return
+        strikes, implied_vols, selected_date = smile
 
-        for _, row in options.iterrows():
-            K = row['strike']
-            mid_price = (row['bid'] + row['ask']) / 2
-            if mid_price > 0:
-                try:
-                    iv = implied_volatility(spot, K, T, r, mid_price, option_type)
-                    if iv:
-                        strikes.append(K)
-                        implied_vols.append(iv * 100)
-                except Exception:
-                    continue
+        if len(strikes):
+            import matplotlib.pyplot as plt
 
-        if strikes:
-            plt.figure(figsize=(10, 6))
-            plt.plot(strikes, implied_vols, 'o-', label='Volatilité implicite (%)')
-            plt.title(f"Smile de volatilité implicite ({ticker} - {option_type.upper()})\nÉchéance : {selected_date}")
-            plt.xlabel("Prix d'exercice (Strike)")
-            plt.ylabel("Volatilité implicite (%)")
-            plt.grid(True)
-            plt.tight_layout()
+            fig, ax = plt.subplots(figsize=(10, 6))
+            draw_smile(ax, strikes, implied_vols,
+                       f"Smile de volatilité implicite ({ticker} - {option_type.upper()})\nÉchéance : {selected_date}",
+                       STRIKE_LABEL)
+            fig.tight_layout()
             plt.show()
         else:
             print("Pas de volatilités implicites valides à tracer.")
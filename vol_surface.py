@@ -0,0 +1,163 @@
+"""
+vol_surface.py
+--------------
+Surface de volatilité implicite : calibration SVI par échéance et interpolation en maturité.
+
+Fonctionnalités :
+- Calibration d'une paramétrisation SVI (variance totale en fonction de la log-moneyness) par échéance
+- Interpolation linéaire en variance totale entre échéances
+- Contrôles d'arbitrage (calendrier et papillon)
+- Évaluation vectorisée vol(K, T) sur des tableaux
+- Sauvegarde / chargement des paramètres calibrés (JSON), sans recalibration
+"""
+
+import json
+
+import numpy as np
+from scipy.optimize import least_squares
+from black_scholes import implied_volatility_batch
+
+MIN_POINTS_PER_SLICE = 5
+
+def svi_total_variance(k, a, b, rho, m, sigma):
+    """Variance totale SVI brute : w(k) = a + b (rho (k - m) + sqrt((k - m)^2 + sigma^2))."""
+    x = k - m
+    return a + b * (rho * x + np.sqrt(x**2 + sigma**2))
+
+def fit_svi(k, w, weights=None):
+    """
+    Calibre les paramètres SVI (a, b, rho, m, sigma) sur une tranche (log-moneyness k, variance totale w)
+    par moindres carrés bornés.
+    """
+    k, w = np.asarray(k, dtype=float), np.asarray(w, dtype=float)
+    weights = np.ones_like(w) if weights is None else np.asarray(weights, dtype=float)
+
+    def residuals(p):
+        return weights * (svi_total_variance(k, *p) - w)
+
+    x0 = [w.min(), 0.1, -0.3, k[np.argmin(w)], 0.1]
+    lower = [-w.max(), 0.0, -0.999, 2 * k.min() - abs(k.max()), 1e-4]
+    upper = [w.max(), 10.0, 0.999, 2 * k.max() + abs(k.min()), 10.0]
+    x0 = np.clip(x0, lower, upper)
+    return least_squares(residuals, x0, bounds=(lower, upper)).x
+
+def _svi_butterfly_density(k, a, b, rho, m, sigma):
+    """Fonction g(k) de Gatheral : g >= 0 partout équivaut à l'absence d'arbitrage papillon."""
+    x = k - m
+    root = np.sqrt(x**2 + sigma**2)
+    w = a + b * (rho * x + root)
+    w1 = b * (rho + x / root)
+    w2 = b * sigma**2 / root**3
+    return (1 - k * w1 / (2 * w))**2 - w1**2 / 4 * (1 / w + 0.25) + w2 / 2
+
+
+class VolSurface:
+    """
+    Surface de volatilité calibrée : un jeu de paramètres SVI par maturité.
+
+    La variance totale est interpolée linéairement en T entre deux tranches (à log-moneyness fixée),
+    proportionnellement à T avant la première tranche et à volatilité constante après la dernière.
+    """
+
+    def __init__(self, maturities, params, spot, r):
+        order = np.argsort(maturities)
+        self.maturities = np.asarray(maturities, dtype=float)[order]
+        self.params = np.asarray(params, dtype=float)[order]
+        self.spot = float(spot)
+        self.r = float(r)
+
+    def _slice_variance(self, idx, k):
+        p = self.params[idx]
+        return svi_total_variance(k, p[..., 0], p[..., 1], p[..., 2], p[..., 3], p[..., 4])
+
+    def total_variance(self, k, T):
+        """Variance totale w(k, T) interpolée, vectorisée sur k et T."""
+        k, T = np.broadcast_arrays(np.asarray(k, dtype=float), np.asarray(T, dtype=float))
+        mats = self.maturities
+        right = np.clip(np.searchsorted(mats, T), 1, len(mats) - 1) if len(mats) > 1 else np.zeros(T.shape, int)
+        left = np.maximum(right - 1, 0)
+
+        w_left = self._slice_variance(left, k)
+        w_right = self._slice_variance(right, k)
+        span = mats[right] - mats[left]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weight = np.where(span > 0, (T - mats[left]) / span, 0.0)
+        w = w_left + np.clip(weight, 0.0, 1.0) * (w_right - w_left)
+
+        # Extrapolation : variance proportionnelle à T hors de la plage calibrée
+        w = np.where(T < mats[0], self._slice_variance(np.zeros(T.shape, int), k) * T / mats[0], w)
+        w = np.where(T > mats[-1], self._slice_variance(np.full(T.shape, len(mats) - 1), k) * T / mats[-1], w)
+        return w
+
+    def vol(self, K, T):
+        """Volatilité implicite pour des strikes K et des maturités T (tableaux, broadcasting)."""
+        T = np.asarray(T, dtype=float)
+        k = np.log(np.asarray(K, dtype=float) / (self.spot * np.exp(self.r * T)))
+        return np.sqrt(np.maximum(self.total_variance(k, T), 0.0) / T)
+
+    def arbitrage_report(self, k_grid=None):
+        """
+        Contrôles d'arbitrage sur une grille de log-moneyness :
+        - calendar : maturités où la variance totale décroît par rapport à la tranche précédente
+        - butterfly : maturités où g(k) < 0 (densité négative)
+        """
+        k_grid = np.linspace(-1.0, 1.0, 201) if k_grid is None else np.asarray(k_grid, dtype=float)
+        w = np.array([svi_total_variance(k_grid, *p) for p in self.params])
+        calendar = [float(T) for T, dw in zip(self.maturities[1:], np.diff(w, axis=0)) if (dw < -1e-10).any()]
+        butterfly = [float(T) for T, p in zip(self.maturities, self.params)
+                     if (_svi_butterfly_density(k_grid, *p) < -1e-10).any()]
+        return {'calendar': calendar, 'butterfly': butterfly}
+
+    def to_dict(self):
+        return {'maturities': self.maturities.tolist(), 'params': self.params.tolist(),
+                'spot': self.spot, 'r': self.r}
+
+    def save(self, path):
+        """Enregistre les paramètres calibrés (JSON)."""
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        """Recharge une surface calibrée, sans recalibration."""
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data['maturities'], data['params'], data['spot'], data['r'])
+
+
+def build_surface(snapshot):
+    """
+    Calibre une surface à partir d'un instantané de chaîne (option_chains.take_snapshot).
+
+    Seules les options hors de la monnaie sont retenues (puts sous le forward, calls au-dessus),
+    leurs volatilités implicites sont inversées en une fois puis chaque échéance est calibrée en SVI.
+    """
+    otm = ((snapshot['type'] == 'put') & (snapshot['strike'] < snapshot['forward'])) | \
+          ((snapshot['type'] == 'call') & (snapshot['strike'] >= snapshot['forward']))
+    quotes = snapshot[otm]
+    iv = implied_volatility_batch(quotes['spot'].to_numpy(), quotes['strike'].to_numpy(), quotes['T'].to_numpy(),
+                                  quotes['r'].to_numpy(), quotes['mid'].to_numpy(), quotes['type'].to_numpy())
+    quotes = quotes.assign(iv=iv['vol'])[iv['status'] == 'ok']
+
+    maturities, params = [], []
+    for T, slice_ in quotes.groupby('T'):
+        if len(slice_) < MIN_POINTS_PER_SLICE:
+            continue
+        k = np.log(slice_['strike'].to_numpy() / slice_['forward'].to_numpy())
+        w = slice_['iv'].to_numpy()**2 * T
+        maturities.append(T)
+        params.append(fit_svi(k, w))
+
+    if not maturities:
+        raise ValueError("Aucune échéance avec suffisamment de volatilités implicites pour calibrer la surface.")
+    return VolSurface(maturities, params, snapshot['spot'].iloc[0], snapshot['r'].iloc[0])
+
+if __name__ == "__main__":
+    from option_chains import take_snapshot
+
+    ticker = input("Ticker (ex: AAPL, MSFT) : ").upper()
+    surface = build_surface(take_snapshot(ticker))
+    print(f"{len(surface.maturities)} échéance(s) calibrée(s).")
+    print(f"Contrôles d'arbitrage : {surface.arbitrage_report()}")
+    surface.save(f"vol_surface_{ticker}.json")
+    print(f"Surface sauvegardée sous : vol_surface_{ticker}.json")